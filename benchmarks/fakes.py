@@ -0,0 +1,277 @@
+"""
+Local stand-ins for the external services the pipeline calls, so that
+benchmarks run offline and reproducibly:
+
+- FakeOpenRouter: an HTTP server speaking the chat completions API, with SSE
+  streaming, configurable (per-model) first-token latency, token rate, stalls and 429s
+- FakeRecognizer: a speech_recognition Recognizer with canned transcripts
+- FakeSynthesizer: returns silent MP3 frames of a realistic length
+- FakeGmailTransport: an httplib2-style transport answering Gmail sends and batches
+"""
+import datetime
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import speech_recognition as sr
+
+WORDS = (
+    "the assistant answers questions about the weather travel cooking science history "
+    "and everyday tasks in short clear sentences that are easy to listen to"
+).split()
+
+
+def canned_reply(prompt, tokens):
+    """Deterministic reply of `tokens` words (split into sentences) for a prompt."""
+    rng = random.Random(prompt)
+    words = [rng.choice(WORDS) for _ in range(tokens)]
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients dropping pooled connections at shutdown."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeOpenRouter:
+    """Threaded local server for POST /chat/completions (streaming and non-streaming)."""
+
+    def __init__(self, first_token_latency=0.2, token_interval=0.005, reply_tokens=48,
+                 rate_limit_every=0, retry_after=0.05, stall_every=0, stall_seconds=2.0):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.reply_tokens = reply_tokens
+        # Every Nth request is answered with 429 (0 disables rate limiting)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        # Every Nth request waits stall_seconds longer for its first token (a slow tail)
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        # model -> {setting: value} overriding the settings above for that model
+        self.model_overrides = {}
+        self.counters = {"requests": 0, "rate_limited": 0, "streamed": 0, "stalled": 0}
+        self.model_requests = {}
+        self._lock = threading.Lock()
+        self._server = QuietHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openrouter", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(name)
+            setattr(self, name, value)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+            return self.counters[name]
+
+    def _count_model(self, model):
+        with self._lock:
+            self.model_requests[model] = self.model_requests.get(model, 0) + 1
+            return self.model_requests[model]
+
+    def setting(self, model, name):
+        return self.model_overrides.get(model, {}).get(name, getattr(self, name))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so the client's connection pool is exercised
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                data = json.loads(self.rfile.read(length) or b"{}")
+                fake._count("requests")
+                model = data.get("model")
+                number = fake._count_model(model)
+
+                def setting(name):
+                    return fake.setting(model, name)
+
+                rate_limit_every = setting("rate_limit_every")
+                if rate_limit_every and number % rate_limit_every == 0:
+                    fake._count("rate_limited")
+                    self._send_json(429, {"error": {"message": "Rate limit exceeded"}},
+                                    {"Retry-After": str(setting("retry_after"))})
+                    return
+
+                prompt = data["messages"][-1]["content"] if data.get("messages") else ""
+                reply = canned_reply(prompt, fake.reply_tokens)
+                delay = setting("first_token_latency")
+                stall_every = setting("stall_every")
+                if stall_every and number % stall_every == 0:
+                    fake._count("stalled")
+                    delay += setting("stall_seconds")
+                time.sleep(delay)
+                if data.get("stream"):
+                    fake._count("streamed")
+                    self._stream(reply, setting("token_interval"))
+                else:
+                    time.sleep(setting("token_interval") * fake.reply_tokens)
+                    self._send_json(200, {
+                        "choices": [{"message": {"role": "assistant", "content": reply}}],
+                        "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": fake.reply_tokens}
+                    })
+
+            def _send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, reply, token_interval):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, word in enumerate(reply.split(" ")):
+                    if index:
+                        time.sleep(token_interval)
+                    delta = {"choices": [{"delta": {"content": (" " if index else "") + word}}]}
+                    self._chunk(f"data: {json.dumps(delta)}\n\n".encode())
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+class FakeRecognizer(sr.Recognizer):
+    """Recognizer whose Google calls sleep and return canned transcripts."""
+
+    TRANSCRIPTS = [
+        "what is the weather like tomorrow",
+        "tell me a fun fact about space",
+        "how do I cook rice",
+        "who wrote the first computer program",
+    ]
+
+    def __init__(self, latency=0.15):
+        super().__init__()
+        self.latency = latency
+
+    def recognize_google(self, audio_data, key=None, language="en-US", pfilter=0, show_all=False, **kwargs):
+        time.sleep(self.latency)
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        if seconds < 0.2:
+            if show_all:
+                return []
+            raise sr.UnknownValueError()
+        transcript = self.TRANSCRIPTS[int(seconds * 10) % len(self.TRANSCRIPTS)]
+        # English audio: the Bengali model is much less confident
+        confidence = 0.92 if language.startswith("en") else 0.35
+        if show_all:
+            return {"alternative": [{"transcript": transcript, "confidence": confidence}], "final": True}
+        return transcript
+
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417-byte frames of 1152 samples
+MP3_FRAME = b"\xff\xfb\x90\x00" + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+class FakeSynthesizer:
+    """Stand-in for gTTS: sleeps per request and returns silent MP3 lasting as long as speech would."""
+
+    def __init__(self, latency=0.08, chars_per_second=15):
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, lang):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        frames = max(1, int(len(text) / self.chars_per_second / MP3_FRAME_SECONDS))
+        return MP3_FRAME * frames
+
+
+class FakeResponse(dict):
+    """Minimal httplib2.Response: a header dict with a status."""
+
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+        self.reason = "OK" if status < 300 else "Error"
+        self["status"] = str(status)
+
+
+class FakeGmailTransport:
+    """httplib2.Http stand-in answering messages.send and batch requests after a delay."""
+
+    def __init__(self, latency=0.1):
+        self.latency = latency
+        self.requests = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        time.sleep(self.latency)
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        with self._lock:
+            self.requests += 1
+        if "/batch" in uri:
+            return self._batch(body, headers)
+        with self._lock:
+            self.messages += 1
+        return FakeResponse(200, {"content-type": "application/json"}), json.dumps({"id": uuid.uuid4().hex}).encode()
+
+    def _batch(self, body, headers):
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        content_ids = re.findall(r"Content-ID: (<[^>]+>)", body)
+        with self._lock:
+            self.messages += len(content_ids)
+        boundary = "fake_batch_boundary"
+        parts = []
+        for content_id in content_ids:
+            payload = json.dumps({"id": uuid.uuid4().hex})
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+            )
+        content = "".join(parts) + f"--{boundary}--\r\n"
+        response = FakeResponse(200, {"content-type": f"multipart/mixed; boundary={boundary}"})
+        return response, content.encode("utf-8")
+
+
+def fake_gmail_credentials():
+    """Credentials that stay valid for the whole run, so no OAuth flow or refresh happens."""
+    from google.oauth2.credentials import Credentials
+    expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(days=1)
+    return Credentials(token="benchmark-token", expiry=expiry)
@@ -0,0 +1,106 @@
+"""
+Import-time profile of the app's modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`,
+several times, and the median cumulative time is reported together with the
+slowest top-level packages it pulled in.
+
+    python benchmarks/import_profile.py --save before.json
+    python benchmarks/import_profile.py --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["voicebot", "voicebot.pipeline", "voicebot.server"]
+
+
+def importtime(code):
+    """Return [(depth, module, cumulative microseconds)] for one cold interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+
+def profile_once(module, startup):
+    """Total time and per-package time (microseconds) of one cold import of a module."""
+    total = 0
+    packages = {}
+    ancestors = []
+    # Children are printed before their parents, so walk the tree backwards
+    for depth, name, micros in reversed(importtime(f"import {module}")):
+        del ancestors[depth:]
+        package = name.split(".")[0]
+        if depth == 0 and name not in startup:
+            total += micros
+        # Attribute each subtree to the outermost import of its package
+        if package not in ancestors and (depth > 0 or name not in startup):
+            packages[package] = packages.get(package, 0) + micros
+        ancestors.append(package)
+    return total, packages
+
+
+def profile(module, repeat, startup):
+    """Median total import time (ms) and time per top-level package."""
+    runs = [profile_once(module, startup) for _ in range(repeat)]
+    total = statistics.median(run[0] for run in runs) / 1000
+    # The module's own package is the total; list what it pulled in
+    names = {name for _, packages in runs for name in packages} - {module.split(".")[0]}
+    packages = {name: statistics.median(run[1].get(name, 0) for run in runs) / 1000 for name in names}
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {"total_ms": round(total, 1), "packages": {name: round(ms, 1) for name, ms in slowest}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Modules the interpreter imports on its own are not part of the app's cost
+    startup = {name for depth, name, _ in importtime("pass") if depth == 0}
+
+    report = {}
+    for module in args.modules:
+        report[module] = profile(module, args.repeat, startup)
+        total = report[module]["total_ms"]
+        line = f"{module:<24} {total:8.1f} ms"
+        if module in baseline:
+            before = baseline[module]["total_ms"]
+            line += f"   (before {before:.1f} ms, {total - before:+.1f} ms)"
+        print(line)
+        for name, ms in list(report[module]["packages"].items())[:args.top]:
+            print(f"    {name:<28} {ms:8.1f} ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Canned inputs for the benchmarks: synthetic utterances (seeded, so every
+run sees the same samples), WAV loading, and the prompts used for text turns.
+"""
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+PROMPTS = [
+    "What is the weather like tomorrow?",
+    "Tell me a fun fact about space.",
+    "How do I cook rice?",
+    "Who wrote the first computer program?",
+    "Give me three tips for learning a language.",
+    "Explain how a rainbow forms.",
+]
+
+BENGALI_PROMPTS = [
+    "আগামীকাল আবহাওয়া কেমন হবে?",
+    "মহাকাশ সম্পর্কে একটি মজার তথ্য বলো।",
+]
+
+EMAIL_PROMPTS = [
+    "Send an email to bob@example.com subject Lunch. Let's meet at noon tomorrow.",
+    "Send email to alice@example.com about the report saying the numbers are ready",
+]
+
+
+def synth_utterance(speech_seconds=1.5, lead_seconds=0.3, tail_seconds=1.0, seed=0, sample_rate=SAMPLE_RATE):
+    """Speech-like float32 audio: a quiet lead-in, voiced syllables, then trailing silence."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(speech_seconds * sample_rate)) / sample_rate
+    # Harmonics of a gliding pitch, amplitude-modulated at a syllable rate of about 4 Hz
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.cumsum(np.pi * pitch / sample_rate)
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0.15, None)
+    speech = 0.3 * voiced * envelope / np.max(np.abs(voiced))
+
+    def noise(seconds):
+        return 0.002 * rng.standard_normal(int(seconds * sample_rate))
+
+    audio = np.concatenate([noise(lead_seconds), speech + noise(speech_seconds), noise(tail_seconds)])
+    return audio.astype(np.float32)
+
+
+def load_wav(path):
+    """Read a 16-bit PCM WAV file as mono float32 samples and its sample rate."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    samples = pcm.reshape(-1, channels).mean(axis=1) / 32768.0
+    return samples.astype(np.float32), sample_rate
+
+
+def blocks(samples, sample_rate, block_ms=30):
+    """Split audio into microphone-sized blocks, as the input stream would deliver them."""
+    size = int(sample_rate * block_ms / 1000)
+    for start in range(0, len(samples), size):
+        yield samples[start:start + size]
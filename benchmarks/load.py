@@ -0,0 +1,296 @@
+"""
+Concurrent-session load generator.
+
+Serves the real pipeline (wired to the fakes in benchmarks/fakes.py) with
+the asyncio server in this process, then simulates N conversations over
+WebSocket, each doing a mix of text and voice turns with think time in
+between. For every concurrency level it samples throughput, threads, open
+file descriptors, RSS and event-loop lag over time and summarises tail
+latency, so the saturation point shows up as throughput levelling off while
+latency climbs.
+
+    python -m benchmarks.load --sessions 10,50,200 --duration 20
+    python -m benchmarks.load --sessions 500 --think 5 --voice-ratio 0.5 --save load.json
+
+File descriptor counts include the client ends of the simulated connections.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+from voicebot.audio_utils import to_pcm16
+from voicebot.request_scheduler import RequestScheduler
+from voicebot.server import create_app
+from voicebot.tracing import percentile
+
+from .inputs import BENGALI_PROMPTS, PROMPTS, SAMPLE_RATE, synth_utterance
+from .run import Bench, rss_mb
+
+
+def open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 1) if values else None,
+        "p95": round(percentile(values, 95), 1) if values else None,
+        "p99": round(percentile(values, 99), 1) if values else None
+    }
+
+
+class Level:
+    """Results of one concurrency level."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.latencies = {"text": [], "voice": []}  # end-to-end ms, until the last audio segment
+        self.first_audio = []  # ms from sending the turn to its first MP3 segment
+        self.errors = 0
+        self.completed = 0
+        self.active = 0
+        self.samples = []
+
+    def summary(self, elapsed):
+        latencies = self.latencies["text"] + self.latencies["voice"]
+        return {
+            "sessions": self.sessions,
+            "turns": self.completed,
+            "errors": self.errors,
+            "throughput_tps": round(self.completed / elapsed, 2),
+            "latency_ms": summarize(latencies),
+            "text_latency_ms": summarize(self.latencies["text"]),
+            "voice_latency_ms": summarize(self.latencies["voice"]),
+            "first_audio_ms": summarize(self.first_audio),
+            "max_threads": max(sample["threads"] for sample in self.samples),
+            "max_fds": max((sample["fds"] or 0) for sample in self.samples),
+            "max_rss_mb": max(sample["rss_mb"] for sample in self.samples),
+            "max_loop_lag_ms": max(sample["loop_lag_ms"] for sample in self.samples),
+            "timeline": self.samples
+        }
+
+
+async def run_turn(ws, level, kind, payload):
+    """Send one turn and wait for its audio_end; records latency on success."""
+    started = time.perf_counter()
+    first_audio = None
+    if kind == "voice":
+        await ws.send_json({"type": "audio_start", "sample_rate": SAMPLE_RATE})
+        for chunk in payload:
+            await ws.send_bytes(chunk)
+        await ws.send_json({"type": "audio_end"})
+    else:
+        await ws.send_json({"type": "text", "text": payload})
+
+    failed = False
+    async for msg in ws:
+        if msg.type == aiohttp.WSMsgType.BINARY:
+            if first_audio is None:
+                first_audio = time.perf_counter()
+            continue
+        if msg.type != aiohttp.WSMsgType.TEXT:
+            break
+        event = msg.json()
+        if event["type"] == "error":
+            failed = True
+        elif event["type"] == "audio_end":
+            break
+    else:
+        failed = True
+
+    if failed:
+        level.errors += 1
+        return
+    level.completed += 1
+    level.latencies[kind].append((time.perf_counter() - started) * 1000)
+    if first_audio is not None:
+        level.first_audio.append((first_audio - started) * 1000)
+
+
+async def simulate_user(http, base_url, level, deadline, args, utterances, rng):
+    """One conversation: open a session and stream turns until the deadline."""
+    # Stagger arrivals over the ramp-up so all sessions do not start in lockstep
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    language = "auto" if rng.random() < args.bengali_ratio else "en"
+    async with http.post(f"{base_url}/sessions", json={"language": language, "use_response_cache": False}) as resp:
+        session_id = (await resp.json())["session_id"]
+
+    prompts = BENGALI_PROMPTS if language == "auto" else PROMPTS
+    async with http.ws_connect(f"{base_url}/sessions/{session_id}/stream") as ws:
+        while time.monotonic() < deadline:
+            if rng.random() < args.voice_ratio:
+                kind, payload = "voice", rng.choice(utterances)
+            else:
+                kind, payload = "text", rng.choice(prompts)
+            level.active += 1
+            try:
+                await asyncio.wait_for(run_turn(ws, level, kind, payload), args.turn_timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # The stream is now out of step with the server; this user leaves
+                level.errors += 1
+                return
+            finally:
+                level.active -= 1
+            if args.think:
+                await asyncio.sleep(min(rng.expovariate(1 / args.think), max(0.0, deadline - time.monotonic())))
+
+
+async def sample(level, limiter, started, interval, stop):
+    """Record resource usage every `interval` seconds; loop lag is how late the sampler wakes."""
+    last_completed = 0
+    while not stop.is_set():
+        before = time.perf_counter()
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        lag = max(0.0, time.perf_counter() - before - interval) if not stop.is_set() else 0.0
+        point = {
+            "t": round(time.perf_counter() - started, 1),
+            "active_turns": level.active,
+            "queued_requests": limiter.stats()["queue_depth"],
+            "turns_per_s": round((level.completed - last_completed) / interval, 1),
+            "threads": threading.active_count(),
+            "fds": open_fds(),
+            "rss_mb": round(rss_mb(), 1),
+            "loop_lag_ms": round(lag * 1000, 1)
+        }
+        last_completed = level.completed
+        level.samples.append(point)
+        print(f"  t={point['t']:>5}s  active {point['active_turns']:>4}  queued {point['queued_requests']:>4}  "
+              f"{point['turns_per_s']:>6} turns/s  "
+              f"threads {point['threads']:>4}  fds {point['fds']}  rss {point['rss_mb']} MB  "
+              f"lag {point['loop_lag_ms']} ms", flush=True)
+
+
+async def run_level(base_url, limiter, sessions, args, utterances):
+    level = Level(sessions)
+    rng = random.Random(f"{args.seed}-{sessions}")
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=args.turn_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.ramp + args.duration
+        stop = asyncio.Event()
+        sampler = asyncio.ensure_future(sample(level, limiter, started, args.interval, stop))
+        users = [
+            simulate_user(http, base_url, level, deadline, args, utterances, random.Random(rng.random()))
+            for _ in range(sessions)
+        ]
+        results = await asyncio.gather(*users, return_exceptions=True)
+        level.errors += sum(isinstance(result, Exception) for result in results)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+    # Throughput over the window in which sessions were active (arrivals are spread over the ramp-up)
+    return level.summary(max(min(elapsed, args.ramp + args.duration) - args.ramp / 2, 1e-9))
+
+
+def print_summary(result):
+    latency = result["latency_ms"]
+    print(f"{result['sessions']} sessions: {result['turns']} turns, {result['errors']} errors, "
+          f"{result['throughput_tps']} turns/s, latency p50 {latency['p50']} / p95 {latency['p95']} / "
+          f"p99 {latency['p99']} ms, first audio p95 {result['first_audio_ms']['p95']} ms, "
+          f"threads {result['max_threads']}, fds {result['max_fds']}, rss {result['max_rss_mb']} MB, "
+          f"loop lag {result['max_loop_lag_ms']} ms")
+    queue = result["queue"]
+    if queue["rate_per_minute"]:
+        print(f"  quota queue: max depth {queue['max_queue_depth']}, wait p50 {queue['wait_p50_ms']} / "
+              f"p95 {queue['wait_p95_ms']} ms, {queue['timeouts']} timeouts, {queue['rejected']} rejected")
+
+
+def saturation(results):
+    """The first level past the saturation point and why, or None.
+
+    A level is saturated when its extra sessions add under 10% throughput,
+    or when its p95 latency is more than twice that of the lightest level.
+    """
+    for previous, current in zip(results, results[1:]):
+        if current["throughput_tps"] < previous["throughput_tps"] * 1.1:
+            return current["sessions"], f"throughput grew under 10% over {previous['sessions']} sessions"
+        base_p95 = results[0]["latency_ms"]["p95"]
+        p95 = current["latency_ms"]["p95"]
+        if base_p95 and p95 and p95 > 2 * base_p95:
+            return current["sessions"], f"p95 latency {p95} ms is over twice the {base_p95} ms at {results[0]['sessions']} sessions"
+    return None
+
+
+async def serve_and_load(args, levels):
+    with tempfile.TemporaryDirectory(prefix="voicebot-load-") as workdir:
+        bench = Bench(workdir)
+        if args.quota:
+            bench.pipeline.limiter = RequestScheduler(rate_per_minute=args.quota, burst=args.burst)
+        runner = web.AppRunner(create_app(pipeline=bench.pipeline), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        base_url = f"http://{host}:{port}"
+
+        chunk = int(SAMPLE_RATE * args.chunk_ms / 1000) * 2
+        utterances = []
+        for seed in range(4):
+            pcm = to_pcm16(synth_utterance(1.0 + 0.3 * seed, seed=seed))
+            utterances.append([pcm[i:i + chunk] for i in range(0, len(pcm), chunk)])
+
+        results = []
+        try:
+            for sessions in levels:
+                print(f"{sessions} sessions (think {args.think}s, voice {args.voice_ratio:.0%}):")
+                result = await run_level(base_url, bench.pipeline.limiter, sessions, args, utterances)
+                result["queue"] = bench.pipeline.limiter.stats()
+                print_summary(result)
+                results.append(result)
+        finally:
+            await runner.cleanup()
+            bench.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the voice pipeline.")
+    parser.add_argument("--sessions", default="10,50,100", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per level after ramp-up")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions arrive")
+    parser.add_argument("--think", type=float, default=1.0, help="mean think time between turns (0 = none)")
+    parser.add_argument("--voice-ratio", type=float, default=0.3, help="share of turns sent as audio")
+    parser.add_argument("--bengali-ratio", type=float, default=0.1, help="share of sessions in Bengali")
+    parser.add_argument("--quota", type=float, default=0, help="LLM requests per minute for all sessions (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=10, help="requests allowed at once under --quota")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio sent per WebSocket frame")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between resource samples")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results (with timelines) to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        levels = [int(value) for value in args.sessions.split(",") if value.strip()]
+    except ValueError:
+        parser.error("--sessions must be comma-separated integers")
+
+    results = asyncio.run(serve_and_load(args, levels))
+    knee = saturation(results)
+    if knee is not None:
+        print(f"Saturated at {knee[0]} sessions: {knee[1]}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"settings": vars(args), "levels": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
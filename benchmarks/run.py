@@ -0,0 +1,423 @@
+"""
+Offline benchmark of the voice pipeline.
+
+Drives the real Pipeline (VAD, transcription, intent routing, response
+cache, HTTP client, streaming parser, TTS cache and email outbox) against
+the local fakes in benchmarks/fakes.py, and reports per-stage and
+end-to-end latency percentiles, throughput and memory for each scenario.
+
+    python -m benchmarks.run                          # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --update-baseline        # store this run as the new baseline
+    python -m benchmarks.run --scenarios voice --turns 50 --concurrency 8
+
+Exits with status 1 when a metric regresses beyond the tolerance.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from voicebot import Pipeline, SessionState
+from voicebot import config
+from voicebot.email_outbox import EmailOutbox
+from voicebot.gmail_client import GmailClient
+from voicebot.http_client import OpenRouterClient
+from voicebot.coalescing import Coalescer
+from voicebot.model_router import ModelRouter
+from voicebot.request_scheduler import RequestScheduler
+from voicebot.response_cache import ResponseCache
+from voicebot.tracing import Tracer, percentile
+from voicebot.tts_cache import AudioSegmentCache
+from voicebot.vad import UtteranceCapture, VoiceActivityDetector, capture_utterance
+
+from .fakes import FakeGmailTransport, FakeOpenRouter, FakeRecognizer, FakeSynthesizer, fake_gmail_credentials
+from .inputs import BENGALI_PROMPTS, EMAIL_PROMPTS, PROMPTS, SAMPLE_RATE, blocks, load_wav, synth_utterance
+
+PRIMARY_MODEL = "bench/primary"
+FALLBACK_MODEL = "bench/fallback"
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Latencies of the fake services; stored with results so baselines are only compared like for like
+FAKE_SETTINGS = {
+    "llm_first_token_s": 0.2,
+    "llm_token_interval_s": 0.005,
+    "llm_reply_tokens": 48,
+    "stt_latency_s": 0.15,
+    "tts_latency_s": 0.08,
+    "gmail_latency_s": 0.1,
+}
+
+
+class Bench:
+    """The pipeline wired to fakes, plus the inputs shared by the scenarios."""
+
+    def __init__(self, workdir, wav_paths=()):
+        settings = FAKE_SETTINGS
+        self.openrouter = FakeOpenRouter(
+            first_token_latency=settings["llm_first_token_s"],
+            token_interval=settings["llm_token_interval_s"],
+            reply_tokens=settings["llm_reply_tokens"]
+        )
+        self.client = OpenRouterClient(self.openrouter.url, api_key="benchmark", backoff_base=0.05)
+        self.synthesizer = FakeSynthesizer(latency=settings["tts_latency_s"])
+        self.gmail_transport = FakeGmailTransport(latency=settings["gmail_latency_s"])
+        gmail = GmailClient(http_factory=lambda: self.gmail_transport, credentials=fake_gmail_credentials())
+        self.outbox = EmailOutbox(gmail.send_batch, db_path=os.path.join(workdir, "outbox.sqlite3"))
+        self.pipeline = Pipeline(
+            client=self.client,
+            response_cache=ResponseCache(db_path=os.path.join(workdir, "responses.sqlite3")),
+            tts_cache=AudioSegmentCache(os.path.join(workdir, "tts")),
+            gmail_client=gmail,
+            outbox=self.outbox,
+            recognizer_factory=lambda: FakeRecognizer(latency=settings["stt_latency_s"]),
+            synthesizer=self.synthesizer,
+            tracer=Tracer(path=None),
+            models=ModelRouter([PRIMARY_MODEL]),
+            limiter=RequestScheduler(rate_per_minute=0)
+        )
+        self.concurrency = 1
+        if wav_paths:
+            self.utterances = [load_wav(path) for path in wav_paths]
+        else:
+            self.utterances = [(synth_utterance(1.0 + 0.3 * seed, seed=seed), SAMPLE_RATE) for seed in range(4)]
+        self.workdir = workdir
+        self.emails = []  # (session_id, enqueued at) of every queued email
+        self._lock = threading.Lock()
+
+    def fresh_caches(self, name):
+        """Give a scenario empty caches, so its hit rates do not depend on earlier scenarios."""
+        directory = os.path.join(self.workdir, name)
+        self.pipeline.response_cache = ResponseCache(db_path=os.path.join(directory, "responses.sqlite3"))
+        self.pipeline.tts_cache = AudioSegmentCache(os.path.join(directory, "tts"))
+
+    def close(self):
+        self.openrouter.close()
+        self.client.close()
+
+
+def reply_and_speak(bench, session, prompt, lang, turn):
+    """Stream the reply, record the turn in history and synthesize its audio."""
+    pipeline = bench.pipeline
+    session.add_message("user", prompt)
+    stream = pipeline.stream_response(session, prompt, lang, turn)
+    text = "".join(stream)
+    session.add_message("assistant", text)
+    for _ in pipeline.synthesize(text, stream.lang, turn):
+        pass
+
+
+def text_turn(bench, session, index, turn):
+    reply_and_speak(bench, session, PROMPTS[index % len(PROMPTS)], None, turn)
+
+
+def bengali_turn(bench, session, index, turn):
+    reply_and_speak(bench, session, BENGALI_PROMPTS[index % len(BENGALI_PROMPTS)], None, turn)
+
+
+def cached_turn(bench, session, index, turn):
+    # A fresh conversation each time, so repeated prompts produce identical cache keys
+    session.clear()
+    reply_and_speak(bench, session, PROMPTS[index % 3], None, turn)
+
+
+def burst_turn(bench, session, index, turn):
+    # Every session asks the same question at about the same time, as after a broadcast prompt
+    session.clear()
+    reply_and_speak(bench, session, PROMPTS[index // bench.concurrency % len(PROMPTS)], None, turn)
+
+
+def voice_turn(bench, session, index, turn):
+    samples, sample_rate = bench.utterances[index % len(bench.utterances)]
+    with turn.span("vad", audio_seconds=round(len(samples) / sample_rate, 2)) as span:
+        capture = UtteranceCapture(
+            VoiceActivityDetector(sample_rate),
+            silence_ms=config.VAD_SILENCE_MS,
+            max_seconds=config.VAD_MAX_SECONDS
+        )
+        recording = capture_utterance(blocks(samples, sample_rate), capture)
+        span.set(captured_seconds=round(len(recording) / sample_rate, 2))
+    audio_data, _ = bench.pipeline.preprocess(recording, sample_rate, turn)
+    text, lang = bench.pipeline.transcribe(session, audio_data, turn)
+    reply_and_speak(bench, session, text, lang, turn)
+
+
+def email_turn(bench, session, index, turn):
+    prompt = EMAIL_PROMPTS[index % len(EMAIL_PROMPTS)]
+    with bench._lock:
+        bench.emails.append((session.session_id, time.time()))
+    reply, _ = bench.pipeline.get_response(session, prompt, None, turn)
+    if "queued" not in reply:
+        raise RuntimeError(f"email was not queued: {reply}")
+
+
+SCENARIOS = {
+    "text": (text_turn, {}),
+    "text_cached": (cached_turn, {"use_response_cache": True}),
+    "bengali": (bengali_turn, {"language": "auto"}),
+    "voice": (voice_turn, {"language": "auto"}),
+    "rate_limited": (text_turn, {"fake": {"rate_limit_every": 4}}),
+    # Every 20th request to the primary stalls for 2 s: alone, then hedged on a fallback model
+    "slow_tail": (text_turn, {"fake": {"model_overrides": {PRIMARY_MODEL: {"stall_every": 20}}}}),
+    "hedged": (text_turn, {
+        "models": [PRIMARY_MODEL, FALLBACK_MODEL],
+        "fake": {"model_overrides": {PRIMARY_MODEL: {"stall_every": 20}}}
+    }),
+    # The primary is always rate limited, so every turn falls back
+    "fallback": (text_turn, {
+        "models": [PRIMARY_MODEL, FALLBACK_MODEL],
+        "fake": {"model_overrides": {PRIMARY_MODEL: {"rate_limit_every": 1}}}
+    }),
+    # A quota of 4 requests per second (burst 4) shared by all sessions
+    "quota": (text_turn, {"limiter": {"rate_per_minute": 240, "burst": 4}}),
+    # Identical concurrent prompts share one upstream call
+    "coalesced": (burst_turn, {"use_response_cache": True}),
+    "email": (email_turn, {}),
+}
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def wait_for_emails(bench, timeout=30.0):
+    """Wait until every queued email is delivered; returns delivery latencies in ms."""
+    deadline = time.time() + timeout
+    sessions = {session_id for session_id, _ in bench.emails}
+    while True:
+        entries = {s: bench.outbox.statuses(s, limit=len(bench.emails))[::-1] for s in sessions}
+        if all(entry["status"] == "sent" for rows in entries.values() for entry in rows):
+            break
+        if time.time() > deadline:
+            raise RuntimeError("emails were not delivered in time")
+        time.sleep(0.02)
+    # Outbox ids grow in enqueue order, so entries line up with the recorded enqueue times
+    latencies = []
+    for session_id in sessions:
+        enqueued = [at for s, at in bench.emails if s == session_id]
+        for at, entry in zip(enqueued, entries[session_id]):
+            latencies.append((entry["updated_at"] - at) * 1000)
+    return sorted(latencies)
+
+
+def run_scenario(bench, name, turns, concurrency, warmup, measure_heap):
+    turn_fn, options = SCENARIOS[name]
+    pipeline = bench.pipeline
+    bench.fresh_caches(name)
+    # Large enough to keep every span of the run (a turn has several synthesis spans)
+    pipeline.tracer = Tracer(path=None, window=max(turns, 1) * 50)
+    # Fresh model statistics, so deadlines learned in one scenario do not carry over
+    pipeline.models = ModelRouter(options.get("models", [PRIMARY_MODEL]), default_deadline=1.0)
+    # No quota unless the scenario sets one (the fake server has none)
+    pipeline.limiter = RequestScheduler(**options.get("limiter", {"rate_per_minute": 0}))
+    pipeline.coalescer = Coalescer()
+    bench.concurrency = concurrency
+    saved = {key: getattr(bench.openrouter, key) for key in options.get("fake", {})}
+    bench.openrouter.configure(**options.get("fake", {}))
+    bench.emails = []
+
+    sessions = [
+        SessionState(language=options.get("language", "en"), use_response_cache=options.get("use_response_cache", False))
+        for _ in range(concurrency)
+    ]
+
+    def run_turns(worker, indices):
+        session = sessions[worker]
+        for index in indices:
+            turn = pipeline.tracer.start_turn(session.session_id, scenario=name)
+            try:
+                turn_fn(bench, session, index, turn)
+            finally:
+                turn.release()
+
+    try:
+        # Warm-up turns (connections, caches, lazy imports) are not measured
+        run_turns(0, range(-warmup, 0))
+        if name == "email":
+            wait_for_emails(bench)
+        pipeline.tracer.reset()
+        bench.emails = []
+        requests_before = dict(bench.openrouter.counters)
+        client_before = bench.client.stats()
+
+        if measure_heap:
+            tracemalloc.start()
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(run_turns, worker, range(worker, turns, concurrency))
+                for worker in range(concurrency)
+            ]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - started
+        heap_peak = None
+        if measure_heap:
+            heap_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+
+        stages = pipeline.tracer.percentiles()
+        if name == "email":
+            latencies = wait_for_emails(bench)
+            stages["email_delivery"] = {
+                "count": len(latencies),
+                "p50": round(percentile(latencies, 50), 2),
+                "p95": round(percentile(latencies, 95), 2),
+                "p99": round(percentile(latencies, 99), 2)
+            }
+    finally:
+        bench.openrouter.configure(**saved)
+
+    client_after = bench.client.stats()
+    result = {
+        "turns": turns,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_tps": round(turns / wall, 2),
+        "stages": stages,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "llm_requests": bench.openrouter.counters["requests"] - requests_before["requests"],
+        "rate_limited": bench.openrouter.counters["rate_limited"] - requests_before["rate_limited"],
+        "client_retries": client_after["retries"] - client_before["retries"],
+    }
+    if len(pipeline.models.models) > 1:
+        result["models"] = pipeline.models.stats()
+    if "limiter" in options:
+        result["queue"] = pipeline.limiter.stats()
+    coalescing = pipeline.coalescer.stats()
+    if coalescing["coalesced"]:
+        result["coalescing"] = coalescing
+    if heap_peak is not None:
+        result["heap_peak_mb"] = round(heap_peak, 1)
+    return result
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Return human-readable regressions of `results` against `baseline`."""
+    problems = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        # Very short runs (e.g. queueing emails) are too noisy to compare throughput
+        if before["wall_seconds"] >= 1 and result["throughput_tps"] < before["throughput_tps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {result['throughput_tps']} < baseline {before['throughput_tps']} turns/s")
+        for stage, values in result["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None:
+                continue
+            for key in ("p50", "p95"):
+                new_ms, old_ms = values[key], old[key]
+                if new_ms is None or old_ms is None:
+                    continue
+                if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > min_ms:
+                    problems.append(f"{name}/{stage}: {key} {new_ms:.1f} ms > baseline {old_ms:.1f} ms")
+    return problems
+
+
+def print_report(results, baseline):
+    for name, result in results.items():
+        turn = result["stages"].get("turn", {})
+        line = (f"{name}: {result['turns']} turns x{result['concurrency']}  "
+                f"{result['throughput_tps']} turns/s  end-to-end p50 {turn.get('p50')} / "
+                f"p95 {turn.get('p95')} / p99 {turn.get('p99')} ms  rss {result['rss_mb']} MB")
+        if result.get("rate_limited"):
+            line += f"  429s {result['rate_limited']} (retries {result['client_retries']})"
+        print(line)
+        if "queue" in result:
+            queue = result["queue"]
+            print(f"    queue: max depth {queue['max_queue_depth']}, wait p50 {queue['wait_p50_ms']} / "
+                  f"p95 {queue['wait_p95_ms']} ms, {queue['timeouts']} timeouts, {queue['rejected']} rejected")
+        if "coalescing" in result:
+            print(f"    coalescing: {result['coalescing']['upstream']} upstream calls, "
+                  f"{result['coalescing']['coalesced']} coalesced")
+        for model, stats in result.get("models", {}).items():
+            print(f"    model {model}: {stats['requests']} requests, {stats['errors']} errors, "
+                  f"{stats['hedges']} hedged, {stats['wins']} won, deadline {stats['deadline_ms']} ms")
+        before = baseline.get(name, {}).get("stages", {})
+        for stage, values in result["stages"].items():
+            if stage == "turn":
+                continue
+            row = f"    {stage:<16} n={values['count']:<4} p50 {values['p50']:>9} p95 {values['p95']:>9} p99 {values['p99']:>9}"
+            if stage in before and before[stage]["p95"]:
+                row += f"   (baseline p95 {before[stage]['p95']})"
+            print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the voice pipeline.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--turns", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--wav", action="append", default=[], help="16-bit PCM WAV file(s) to use for voice turns")
+    parser.add_argument("--heap", action="store_true", help="also measure the Python heap peak (slows the run)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-ms", type=float, default=20.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("settings") == FAKE_SETTINGS:
+            baseline = stored["scenarios"]
+        else:
+            print("Baseline was recorded with different fake settings; not comparing.")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="voicebot-bench-") as workdir:
+        bench = Bench(workdir, args.wav)
+        try:
+            for name in names:
+                results[name] = run_scenario(bench, name, args.turns, args.concurrency, args.warmup, args.heap)
+        finally:
+            bench.close()
+
+    print_report(results, baseline)
+    report = {"settings": FAKE_SETTINGS, "scenarios": results}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline, args.tolerance, args.min_ms)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,24 @@
 import streamlit as st
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
-import speech_recognition as sr
-import requests
-import pyttsx3
+import itertools
 import time
 import os
-import wave
-from threading import Thread
-from gtts import gTTS
-from io import BytesIO
-from tempfile import NamedTemporaryFile
-from dotenv import load_dotenv
-# Add these imports for proper thread context handling
-from streamlit.runtime.scriptrunner import get_script_run_ctx, add_script_run_ctx
-# Add Gmail API imports
-import base64
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-import re
-# Add import for language detection
-from langdetect import detect, LangDetectException
-
-# Gmail API scope
-SCOPES = ['https://www.googleapis.com/auth/gmail.send']
-
-# Load environment variables from .env file
-load_dotenv()
+from queue import Queue
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# The speech -> intent -> LLM -> speech pipeline lives in the voicebot package
+from voicebot import Pipeline, SessionState
+from voicebot.config import (
+    AUDIO_STORE_MEMORY_MB, AUDIO_STORE_SESSION_MB, BARGE_IN_MIN_SPEECH_MS, BARGE_IN_THRESHOLD, DUPLEX,
+    SAVE_DEBUG_AUDIO, TRACING, VAD_MAX_SECONDS, VAD_SILENCE_MS
+)
+from voicebot.audio_store import AudioStore
+from voicebot.duplex import DuplexListener
+from voicebot.llm_stream import SentenceBuffer, split_sentences
+from voicebot.vad import UtteranceCapture, VoiceActivityDetector, record_utterance
+from voicebot.audio_utils import mp3_duration
+from voicebot.tts_pipeline import speak_segments, split_segments, wait_for_playback
+from voicebot.speech_worker import SpeechWorker, Utterance, iter_sentence_queue
+from voicebot.speech_scheduler import SchedulerFull, SpeechScheduler
+from voicebot.tracing import NULL_TURN
 
 # Page configuration
 st.set_page_config(
@@ -39,9 +27,38 @@ st.set_page_config(
     layout="centered"
 )
 
+@st.cache_resource
+def get_pipeline():
+    """Create the process-wide pipeline (HTTP pool, caches and outbox shared by all sessions)."""
+    return Pipeline()
+
+@st.cache_resource
+def get_speech_worker():
+    """Start the process-wide pyttsx3 worker (the engine is initialized once)."""
+    return SpeechWorker()
+
+@st.cache_resource
+def get_audio_store():
+    """Create the process-wide store of synthesized audio waiting to be played, scoped by session."""
+    return AudioStore(
+        memory_budget=int(AUDIO_STORE_MEMORY_MB * 1024 * 1024),
+        session_max_bytes=int(AUDIO_STORE_SESSION_MB * 1024 * 1024)
+    )
+
+@st.cache_resource
+def get_speech_scheduler():
+    """Start the process-wide bounded pool that runs background speech for every session."""
+    return SpeechScheduler()
+
+def current_session_id():
+    """Identify the Streamlit session the current thread is working for."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Conversation state used by the pipeline: history, language, context window
+if "session" not in st.session_state:
+    st.session_state.session = SessionState(session_id=current_session_id())
 
 if "audio_recorder_state" not in st.session_state:
     st.session_state.audio_recorder_state = "stopped"
@@ -50,27 +67,48 @@ if "audio_recorder_state" not in st.session_state:
 if "speaking" not in st.session_state:
     st.session_state.speaking = False
 
-# Add stop event to control speech
-if "stop_speech" not in st.session_state:
-    st.session_state.stop_speech = False
-
-# Add audio playback state to session state
-if "play_audio" not in st.session_state:
-    st.session_state.play_audio = False
-
-if "audio_file" not in st.session_state:
-    st.session_state.audio_file = None
+# Audio store clips of the current reply's gTTS segments, held until the next reply
+if "playing" not in st.session_state:
+    st.session_state.playing = []
 
 # Add input_key to session state
 if "input_key" not in st.session_state:
     st.session_state.input_key = 0  # We'll use this to force text input refresh
 
-# Add language preference to session state
-if "language" not in st.session_state:
-    st.session_state.language = "auto"  # Options: "auto", "en", "bn"
+# Stop recording when the user stops talking instead of after a fixed 5 seconds
+if "vad_capture" not in st.session_state:
+    st.session_state.vad_capture = True
+
+# Continuous conversation: keep listening while the bot speaks and let the user interrupt it
+if "duplex" not in st.session_state:
+    st.session_state.duplex = DUPLEX
+
+# This session's always-on microphone in continuous mode
+if "listener" not in st.session_state:
+    st.session_state.listener = None
+
+# Stream responses token by token and speak them sentence by sentence
+if "stream_responses" not in st.session_state:
+    st.session_state.stream_responses = True
+
+# Upload size of the last recording before and after preprocessing
+if "last_upload" not in st.session_state:
+    st.session_state.last_upload = None
+
+# Time each stage of a turn (shown in the sidebar and appended to the trace file)
+if "tracing" not in st.session_state:
+    st.session_state.tracing = TRACING
+
+# Apply status reported by this session's speech jobs since the last rerun
+for event in get_speech_scheduler().drain(st.session_state.session.session_id):
+    if "speaking" in event:
+        st.session_state.speaking = event["speaking"]
+    if "error" in event:
+        print(f"Speech error: {event['error']}")
 
 def record_audio(duration=5, sample_rate=16000):
     """Record audio from microphone."""
+    import sounddevice as sd
     st.session_state.audio_recorder_state = "recording"
     
     # Record audio
@@ -88,368 +126,295 @@ def record_audio(duration=5, sample_rate=16000):
     st.session_state.audio_recorder_state = "stopped"
     return recording, sample_rate
 
-def save_audio(recording, sample_rate, filename="output.wav"):
-    """Save the recorded audio to a file."""
+def record_until_silence(sample_rate=16000):
+    """Record from speech onset until a trailing silence, using voice activity detection."""
+    st.session_state.audio_recorder_state = "recording"
+    
+    capture = UtteranceCapture(
+        VoiceActivityDetector(sample_rate),
+        silence_ms=VAD_SILENCE_MS,
+        max_seconds=VAD_MAX_SECONDS
+    )
+    
+    with st.spinner("Listening..."):
+        recording = record_utterance(capture, sample_rate=sample_rate)
+    
+    st.session_state.audio_recorder_state = "stopped"
+    return recording, sample_rate
+
+def get_listener():
+    """Start this session's always-on microphone listener (continuous conversation)."""
+    # A listener closes itself when left unpolled (e.g. during a very long turn); open a new one
+    if st.session_state.listener is None or not st.session_state.listener.running:
+        session_id = st.session_state.session.session_id
+        scheduler = get_speech_scheduler()
+        audio_store = get_audio_store()
+        
+        def interrupt():
+            # Runs on the listener thread: stops pyttsx3 mid-word and any gTTS synthesis or playback
+            scheduler.cancel(session_id)
+            audio_store.discard_pending(session_id)
+        
+        listener = DuplexListener(
+            # Published clips the page has not played yet are the bot's voice too
+            lambda: scheduler.is_busy(session_id) or audio_store.has_pending(session_id),
+            interrupt,
+            silence_ms=VAD_SILENCE_MS,
+            max_seconds=VAD_MAX_SECONDS,
+            barge_in_threshold=BARGE_IN_THRESHOLD,
+            min_speech_ms=BARGE_IN_MIN_SPEECH_MS
+        )
+        st.session_state.listener = listener.start()
+    return st.session_state.listener
+
+def stop_listener():
+    """Close the microphone of continuous mode."""
+    if st.session_state.listener is not None:
+        st.session_state.listener.stop()
+        st.session_state.listener = None
+
+def wait_for_utterance(listener, audio_placeholder, status, idle_seconds=5.0, poll_interval=0.05,
+                       refresh_interval=0.5, start_slack=0.3):
+    """Wait for the next utterance, playing queued speech meanwhile and cutting it off on barge-in.
+
+    Returns (recording, info), or None after `idle_seconds` with neither speech
+    nor playback so the page can refresh.
+    """
+    session_id = st.session_state.session.session_id
+    scheduler = get_speech_scheduler()
+    audio_store = get_audio_store()
+    message = "🎙️ Listening... talk over the bot to interrupt it."
+    idle_since = refreshed = time.monotonic()
+    status.info(message)
+    while True:
+        utterance = listener.next_utterance(timeout=poll_interval)
+        if listener.interrupted.is_set():
+            listener.interrupted.clear()
+            # Removing the player stops the browser's playback too
+            audio_placeholder.empty()
+        if utterance is not None:
+            return utterance
+        
+        # Replacing the player cuts off what it is playing, so new clips stay in the store
+        # until it should have finished; the browser starts playing a little after each render.
+        # The listener keeps treating the page as speaking until then.
+        now = time.monotonic()
+        if now >= listener.playback_until:
+            new_clips = take_audio()
+            if new_clips:
+                data = audio_store.get_many(new_clips)
+                audio_placeholder.audio(data, format="audio/mp3", autoplay=True)
+                listener.playback_until = now + mp3_duration(data) + start_slack
+        
+        if now - refreshed >= refresh_interval:
+            # Streamlit only acts on widget input (a rerun request) when the script writes to the page
+            status.info(message)
+            refreshed = now
+        
+        if scheduler.is_busy(session_id) or listener.listening() or now < listener.playback_until:
+            idle_since = now
+        elif now - idle_since > idle_seconds:
+            return None
+
+def save_audio(recording, sample_rate, filename=None):
+    """Save the recorded audio to a file (for debugging)."""
+    import soundfile as sf
+    # Unique names so concurrent sessions don't overwrite each other
+    if filename is None:
+        filename = f"output_{time.time_ns()}.wav"
     # Ensure temp directory exists
     os.makedirs("temp", exist_ok=True)
     file_path = os.path.join("temp", filename)
     sf.write(file_path, recording, sample_rate)
     return file_path
 
-def detect_language(text):
-    """Detect the language of the input text."""
-    try:
-        lang = detect(text)
-        # Map language codes to our supported languages
-        if lang == 'bn':
-            return 'bn'  # Bengali
-        else:
-            return 'en'  # Default to English for all other languages
-    except LangDetectException:
-        return 'en'  # Default to English if detection fails
+def start_turn(kind, **attrs):
+    """Begin timing a turn of this session (a no-op turn when tracing is off)."""
+    session = st.session_state.session
+    return get_pipeline().tracer.start_turn(session.session_id, enabled=st.session_state.tracing, kind=kind, **attrs)
 
-def transcribe_audio(audio_file):
-    """Transcribe audio using SpeechRecognition."""
-    recognizer = sr.Recognizer()
-    try:
-        with sr.AudioFile(audio_file) as source:
-            audio_data = recognizer.record(source)
-            
-            # Try to transcribe with the selected language or auto-detect
-            if st.session_state.language == "bn":
-                # Use Bengali language
-                text = recognizer.recognize_google(audio_data, language="bn-BD")
-            elif st.session_state.language == "auto":
-                # First try with general English
-                try:
-                    text = recognizer.recognize_google(audio_data)
-                except:
-                    # If English fails, try Bengali
-                    text = recognizer.recognize_google(audio_data, language="bn-BD")
-            else:
-                # Default to English
-                text = recognizer.recognize_google(audio_data)
-                
-            return text
-    except sr.UnknownValueError:
-        return "Sorry, I couldn't understand the audio."
-    except sr.RequestError as e:
-        return f"Speech recognition service error: {e}"
-    except Exception as e:
-        return f"Error during transcription: {str(e)}"
-
-def extract_email_details(text):
-    """Extract email address and message from text."""
-    # Basic pattern for extracting email addresses
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    
-    # Try to find email addresses in the text
-    email_matches = re.findall(email_pattern, text)
-    
-    if not email_matches:
-        return None, None, "Could not find a valid email address in your message."
-    
-    recipient = email_matches[0]
-    
-    # Try to extract subject
-    subject_match = re.search(r'subject[:\s]+([^\n.]+)', text, re.IGNORECASE)
-    subject = subject_match.group(1).strip() if subject_match else "Message from Voice Assistant"
-    
-    # Remove email address and subject from message to isolate content
-    message = text
-    for email in email_matches:
-        message = message.replace(email, "")
-    if subject_match:
-        message = message.replace(subject_match.group(0), "")
-    
-    # Clean up message
-    message = re.sub(r'send\s+(?:an?\s+)?email\s+(?:to\s+)?', '', message, flags=re.IGNORECASE)
-    message = re.sub(r'with\s+(?:the\s+)?message\s+', '', message, flags=re.IGNORECASE)
-    message = message.strip()
-    
-    if not message:
-        return recipient, subject, "I found an email address but couldn't understand the message content."
-    
-    return recipient, subject, message
-
-def get_gmail_credentials():
-    """Get or refresh Gmail credentials."""
-    creds = None
-    token_path = 'token.json'
-    credentials_path = 'credentials.json'
-    
-    # Client ID from configuration
-    CLIENT_ID = "900054230602-oi3h58bb73fa38k0hs7fl5fe8fn2jqrq.apps.googleusercontent.com"
-    
-    # Check if token.json exists
-    if os.path.exists(token_path):
-        try:
-            creds = Credentials.from_authorized_user_info(
-                json.loads(open(token_path).read()), SCOPES)
-        except Exception as e:
-            print(f"Error loading credentials: {e}")
-    
-    # If no valid credentials available, prompt login
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                print(f"Error refreshing credentials: {e}")
-                creds = None
-        
-        # If credentials still not valid, try OAuth flow
-        if not creds:
-            try:
-                # Check if credentials.json exists first
-                if os.path.exists(credentials_path):
-                    flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
-                else:
-                    # Use client ID directly if credentials.json doesn't exist
-                    flow = InstalledAppFlow.from_client_config({
-                        "installed": {
-                            "client_id": CLIENT_ID,
-                            "project_id": "voice-chatbot-gmail",
-                            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                            "token_uri": "https://oauth2.googleapis.com/token",
-                            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                            "redirect_uris": ["urn:ietf:wg:oauth:2.0:oob", "http://localhost"]
-                        }
-                    }, SCOPES)
-                
-                # Run the flow
-                creds = flow.run_local_server(port=0)
-                
-                # Save the credentials for the next run
-                with open(token_path, 'w') as token:
-                    token.write(creds.to_json())
-            except Exception as e:
-                return None, f"Error during authentication: {str(e)}"
-    
-    return creds, None
-
-def send_email(recipient, subject, message):
-    """Send an email using Gmail API."""
-    try:
-        creds, error = get_gmail_credentials()
-        if error:
-            return False, error
-        
-        # Build Gmail service
-        service = build('gmail', 'v1', credentials=creds)
-        
-        # Create message
-        email_message = MIMEText(message)
-        email_message['to'] = recipient
-        email_message['subject'] = subject
-        
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(email_message.as_bytes()).decode()
-        
-        # Send message
-        service.users().messages().send(
-            userId='me',
-            body={'raw': raw_message}
-        ).execute()
-        
-        return True, f"Email sent successfully to {recipient}!"
-    
-    except Exception as e:
-        return False, f"Error sending email: {str(e)}"
+def resolve_language(text, turn=NULL_TURN):
+    """Return the language to use for a text: the user's choice, or detected in auto mode."""
+    return get_pipeline().resolve_language(st.session_state.session, text, turn)
 
-def handle_email_request(text):
-    """Process a request to send an email."""
-    recipient, subject, message = extract_email_details(text)
-    
-    if not recipient:
-        return message  # This will be the error message from extract_email_details
-    
-    # Send the email
-    success, result = send_email(recipient, subject, message)
-    
-    if success:
-        return result
-    else:
-        return f"Failed to send email: {result}"
+def transcribe_audio(audio_data, turn=NULL_TURN):
+    """Transcribe in-memory audio (sr.AudioData); returns the text and its language (or None)."""
+    return get_pipeline().transcribe(st.session_state.session, audio_data, turn)
 
-def get_bot_response(prompt):
+def get_bot_response(prompt, lang=None, turn=NULL_TURN):
     """Get response from LLaMA 4 via OpenRouter API."""
-    # Check if this is an email request
-    if any(keyword in prompt.lower() for keyword in ["send email", "send an email", "send a mail", "send mail"]):
-        return handle_email_request(prompt)
+    bot_response, _ = get_pipeline().get_response(st.session_state.session, prompt, lang, turn)
+    return bot_response
+
+def stream_bot_response(prompt, placeholder, lang=None, turn=NULL_TURN):
+    """Stream the response into a placeholder and speak each sentence as it completes."""
+    stream = get_pipeline().stream_response(st.session_state.session, prompt, lang, turn)
     
-    # Detect language
-    if st.session_state.language == "auto":
-        detected_lang = detect_language(prompt)
-    else:
-        detected_lang = st.session_state.language
-    
-    # Get API key from environment variable loaded from .env
-    api_key = os.environ.get("OPENROUTER_API_KEY", "")
-    
-    if not api_key:
-        return "Error: OpenRouter API key not found. Please check your .env file."
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # For Bengali, add instruction to respond in Bengali
-    if detected_lang == "bn":
-        system_message = "Please respond in Bengali (Bangla) language."
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": prompt}
-        ]
-    else:
-        messages = [{"role": "user", "content": prompt}]
-    
-    data = {
-        "model": "meta-llama/llama-4-maverick:free",
-        "messages": messages,
-        "max_tokens": 1024
-    }
-    
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
-        headers=headers,
-        json=data
-    )
+    # Local, cached and error replies arrive whole and are spoken in one go
+    if stream.source != "llm":
+        bot_response = "".join(stream)
+        placeholder.markdown(bot_response)
+        speak_in_background(bot_response, stream.lang, turn)
+        return bot_response
+    
+    # Sentences are handed to the TTS thread while the rest is still generating
+    sentence_queue = speak_stream_in_background(stream.lang, turn)
+    sentence_buffer = SentenceBuffer()
+    listener = st.session_state.listener
     
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        return f"Error: {response.status_code} - {response.text}"
-
-def speak_text(text):
-    """Convert text to speech using pyttsx3 or gTTS based on language."""
     try:
-        # Set speaking state to True
-        st.session_state.speaking = True
-        st.session_state.stop_speech = False
-        
-        # Detect language if set to auto
-        if st.session_state.language == "auto":
-            detected_lang = detect_language(text)
-        else:
-            detected_lang = st.session_state.language
-        
-        # For Bengali, always use gTTS
-        if detected_lang == "bn":
-            speak_with_gtts(text, lang="bn")
-            return
-        
-        # For English, use pyttsx3
-        engine = pyttsx3.init()
-        
-        # Split text into sentences to enable stopping between sentences
-        sentences = text.replace('!', '.').replace('?', '.').split('.')
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        for sentence in sentences:
-            if st.session_state.stop_speech:
+        for chunk in stream:
+            if listener is not None and listener.interrupted.is_set():
+                # The user talked over the reply; stop generating and keep what was said
+                turn.set(interrupted=True)
                 break
-            
-            engine.say(sentence)
-            engine.runAndWait()
-            
-            # Small delay to check stop condition
-            time.sleep(0.1)
-            
-        # Reset speaking state
-        st.session_state.speaking = False
+            placeholder.markdown(stream.text + "▌")
+            if stream.error is None:
+                for sentence in sentence_buffer.feed(chunk):
+                    sentence_queue.put(sentence)
+            elif stream.text == chunk:
+                # Nothing was generated, so speak the error itself
+                sentence_queue.put(chunk)
+    finally:
+        remainder = sentence_buffer.flush()
+        if remainder:
+            sentence_queue.put(remainder)
+        sentence_queue.put(None)  # Tell the TTS thread the stream is over
+    
+    placeholder.markdown(stream.text)
+    return stream.text
+
+def speak_text(task, turn, text, lang, pipeline, worker, audio_store):
+    """Convert text to speech using pyttsx3 or gTTS based on language (runs as a speech job)."""
+    # For Bengali, always use gTTS
+    if lang == "bn":
+        speak_with_gtts(task, turn, text, lang, pipeline, audio_store)
+        return
+    
+    try:
+        with turn.span("speak", engine="pyttsx3", chars=len(text)):
+            # For English, the shared worker speaks with its long-lived pyttsx3 engine
+            utterance = worker.speak(task.session_id, split_sentences(text))
+            # Cancelling stops pyttsx3 mid-sentence
+            task.on_cancel(lambda: worker.cancel(task.session_id))
+            utterance.wait()
+            if utterance.error:
+                raise utterance.error
     except Exception as e:
-        # Don't use st.error in a thread
         print(f"Error with pyttsx3: {e}")
         # Fallback to gTTS
-        speak_with_gtts(text)
-        st.session_state.speaking = False
+        speak_with_gtts(task, turn, text, lang, pipeline, audio_store)
 
-def speak_with_gtts(text, lang=None):
+def speak_with_gtts(task, turn, text, lang, pipeline, audio_store):
     """Alternative TTS using Google's Text-to-Speech with language support."""
+    speak_segments_with_gtts(task, turn, split_segments(text), lang, pipeline, audio_store, chars=len(text))
+
+def speak_segments_with_gtts(task, turn, segments, lang, pipeline, audio_store, **attributes):
+    """Synthesize segments (any iterable, consumed lazily) with gTTS and publish them to the player in order."""
     try:
-        st.session_state.speaking = True
-        st.session_state.stop_speech = False
-        
-        # If language not specified, detect it
-        if lang is None:
-            if st.session_state.language == "auto":
-                lang = detect_language(text)
-            else:
-                lang = st.session_state.language
-        
-        # Create a list to hold file paths for cleanup
-        temp_files = []
-        
-        # Split text into shorter segments for better control
-        segments = []
-        current_segment = ""
-        
-        for word in text.split():
-            current_segment += word + " "
-            if len(current_segment) > 100:  # Break into ~100 character segments
-                segments.append(current_segment)
-                current_segment = ""
+        should_stop = task.cancelled.is_set
         
-        if current_segment:  # Add the last segment if it exists
-            segments.append(current_segment)
+        def play(audio_bytes):
+            # Publish in order, then pace by the segment's real length
+            audio_store.publish(task.session_id, audio_bytes)
+            wait_for_playback(mp3_duration(audio_bytes), should_stop)
         
-        for segment in segments:
-            if st.session_state.stop_speech:
-                break
-                
-            tts = gTTS(text=segment, lang=lang)
-            
-            # Create a temp file and save the path for cleanup
-            with NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-                file_path = fp.name
-                temp_files.append(file_path)
-                tts.save(file_path)
-                
-                # Use the main thread's context to play audio
-                st.session_state.audio_file = file_path
-                # Signal the main thread to play it
-                st.session_state.play_audio = True
-                
-                # Wait until it's played or stopped
-                time.sleep(0.5)
-                
-            if st.session_state.stop_speech:
-                break
-                
-            time.sleep(0.1)  # Brief pause to check stop condition
-        
-        # Cleanup temp files
-        for file_path in temp_files:
-            try:
-                if os.path.exists(file_path):
-                    os.unlink(file_path)
-            except:
-                pass
-            
-        st.session_state.speaking = False
+        # Later segments are synthesized while earlier ones play
+        with turn.span("speak", engine="gtts", **attributes) as span:
+            played = speak_segments(
+                segments,
+                lambda segment: pipeline.synthesize_segment(segment, lang, turn),
+                play,
+                should_stop
+            )
+            span.set(segments=played, cancelled=should_stop())
     except Exception as e:
-        # Don't use st.error in a thread
         print(f"Error with gTTS: {e}")
-        st.session_state.speaking = False
 
-def speak_in_background(text):
-    """Speak text in a background thread to not block the UI."""
-    # Get the current Streamlit context
-    ctx = get_script_run_ctx()
-    thread = Thread(target=speak_text, args=(text,))
-    thread.daemon = True  # Set as daemon so it doesn't block app shutdown
-    # Add the context to the thread
-    add_script_run_ctx(thread, ctx)
-    thread.start()
+def speak_sentences(task, turn, sentence_queue, lang, pipeline, worker, audio_store):
+    """Speak sentences from a queue as soon as the response stream produces them."""
+    sentences = iter_sentence_queue(sentence_queue, task)
+    
+    # For English, the speech worker consumes sentences straight from the stream
+    if lang != "bn":
+        current = []  # the sentence being said; the worker only asks for the next once it is done
+        
+        def track(sentences):
+            for sentence in sentences:
+                current[:] = [sentence]
+                yield sentence
+        
+        with turn.span("speak", engine="pyttsx3", streamed=True):
+            utterance = Utterance(task.session_id, None)
+            utterance.sentences = track(iter_sentence_queue(sentence_queue, utterance))
+            worker.submit(utterance)
+            # Registered after submitting, so a cancel that already happened still reaches the utterance
+            task.on_cancel(lambda: worker.cancel(task.session_id))
+            utterance.wait()
+        if utterance.error is None:
+            return
+        print(f"Error with pyttsx3: {utterance.error}")
+        # Fallback to gTTS, from the sentence that failed to the end of the reply
+        sentences = itertools.chain(current, sentences)
+    
+    # Bengali always uses gTTS (the iterator stops on cancellation too). One pipeline
+    # over the whole reply keeps synthesizing ahead across sentence boundaries.
+    segments = (segment for sentence in sentences for segment in split_segments(sentence))
+    speak_segments_with_gtts(task, turn, segments, lang, pipeline, audio_store, streamed=True)
+
+def submit_speech(job, turn, *args):
+    """Run a speech job for this session on the shared pool, replacing any older speech."""
+    # Audio of the replaced response must not play after the new one starts
+    reset_player()
+    # The turn's trace is written once its speech has finished too
+    turn.hold()
+    try:
+        task = get_speech_scheduler().submit(
+            st.session_state.session.session_id,
+            job,
+            turn,
+            *args,
+            get_pipeline(),
+            get_speech_worker(),
+            get_audio_store()
+        )
+    except SchedulerFull:
+        turn.release()
+        st.warning("Too many responses are being spoken right now, so this one is shown as text only.")
+        return None
+    task.add_done_callback(lambda _: turn.release())
+    st.session_state.speaking = True
+    return task
+
+def speak_in_background(text, lang=None, turn=NULL_TURN):
+    """Speak text in the background to not block the UI."""
+    # Resolve the language here; speech jobs have no access to session state
+    submit_speech(speak_text, turn, text, lang or resolve_language(text, turn))
+
+def speak_stream_in_background(lang, turn=NULL_TURN):
+    """Start a background speaker for a streamed response and return its sentence queue."""
+    sentence_queue = Queue()
+    submit_speech(speak_sentences, turn, sentence_queue, lang)
+    return sentence_queue
+
+def take_audio():
+    """Move this session's newly synthesized clips to the player and return them."""
+    new_clips = get_audio_store().take(st.session_state.session.session_id)
+    st.session_state.playing.extend(new_clips)
+    return new_clips
+
+def reset_player():
+    """Drop the current reply's audio, played or still waiting."""
+    audio_store = get_audio_store()
+    audio_store.discard_pending(st.session_state.session.session_id)
+    audio_store.release_all(st.session_state.playing)
+    st.session_state.playing = []
 
 def stop_speaking():
     """Stop the current speech."""
     if st.session_state.speaking:
-        st.session_state.stop_speech = True
-        # Give slightly more time for the speech engine to respond to the stop flag
-        time.sleep(0.5)
+        get_speech_scheduler().cancel(st.session_state.session.session_id)
+        get_audio_store().discard_pending(st.session_state.session.session_id)
         st.session_state.speaking = False
         st.success("Speech stopped")
 
@@ -472,11 +437,95 @@ with st.sidebar:
     
     # Map the radio button selection to language codes
     if language_option == "Bengali":
-        st.session_state.language = "bn"
+        st.session_state.session.language = "bn"
     elif language_option == "English":
-        st.session_state.language = "en"
+        st.session_state.session.language = "en"
     else:
-        st.session_state.language = "auto"
+        st.session_state.session.language = "auto"
+    
+    st.divider()
+    
+    # Voice capture
+    st.subheader("Voice input")
+    st.session_state.vad_capture = st.checkbox(
+        "Stop recording when I stop talking",
+        value=st.session_state.vad_capture,
+        help="Detect the end of speech instead of always recording for 5 seconds."
+    )
+    st.session_state.duplex = st.checkbox(
+        "Continuous conversation",
+        value=st.session_state.duplex,
+        help="Keep the microphone open, answer each thing you say, and stop talking as soon as you interrupt."
+    )
+    if st.session_state.listener is not None:
+        with st.expander("Barge-in stats"):
+            st.json(st.session_state.listener.stats())
+    
+    st.divider()
+    
+    # Response streaming
+    st.subheader("Responses")
+    st.session_state.stream_responses = st.checkbox(
+        "Stream responses",
+        value=st.session_state.stream_responses,
+        help="Show the answer as it is generated and start speaking after the first sentence."
+    )
+    
+    st.session_state.session.use_response_cache = st.checkbox(
+        "Use response cache",
+        value=st.session_state.session.use_response_cache,
+        help="Answer repeated questions from the local cache instead of calling the model."
+    )
+    
+    pipeline = get_pipeline()
+    
+    with st.expander("Connection stats"):
+        st.json(pipeline.client.stats())
+    
+    with st.expander("Model stats"):
+        st.json(pipeline.models.stats())
+    
+    with st.expander("Request queue"):
+        st.json({**pipeline.limiter.stats(), "coalescing": pipeline.coalescer.stats()})
+    
+    with st.expander("Response cache stats"):
+        st.json(pipeline.response_cache.stats())
+    
+    with st.expander("Audio cache stats"):
+        st.json(pipeline.tts_cache.stats())
+    
+    with st.expander("Audio store stats"):
+        st.json(get_audio_store().stats())
+    
+    with st.expander("Speech worker stats"):
+        st.json(get_speech_scheduler().stats())
+    
+    if st.session_state.last_upload:
+        with st.expander("Last recording upload"):
+            st.json(st.session_state.last_upload)
+    
+    # Rolling latency percentiles per pipeline stage, across all sessions
+    st.session_state.tracing = st.checkbox(
+        "Record latency traces",
+        value=st.session_state.tracing,
+        help="Time each stage of a turn and append a trace per turn to the trace file."
+    )
+    with st.expander("Latency (ms)"):
+        latency = pipeline.tracer.percentiles()
+        if latency:
+            st.table([{"stage": stage, **values} for stage, values in latency.items()])
+        else:
+            st.caption("No traced turns yet.")
+    
+    # Delivery status of emails queued from this session
+    outbox_entries = pipeline.outbox_statuses(st.session_state.session.session_id)
+    if outbox_entries:
+        with st.expander("Email outbox", expanded=True):
+            for entry in outbox_entries:
+                status = f"**{entry['status']}** — {entry['recipient']}: {entry['subject']}"
+                if entry["last_error"] and entry["status"] != "sent":
+                    status += f" (attempt {entry['attempts']}: {entry['last_error']})"
+                st.markdown(status)
     
     st.divider()
     
@@ -489,51 +538,83 @@ with st.sidebar:
     - Supports English and Bengali
     """)
 
-# Audio player for gTTS segments
-if st.session_state.play_audio and st.session_state.audio_file:
-    # Only play if we're not stopping
-    if not st.session_state.stop_speech:
-        try:
-            st.audio(st.session_state.audio_file)
-        except:
-            pass
-    # Reset the flag
-    st.session_state.play_audio = False
-    st.session_state.audio_file = None
+# Audio player for gTTS segments (continuous mode replaces or removes it while listening)
+audio_placeholder = st.empty()
+# In continuous mode wait_for_utterance plays segments as they arrive
+if not st.session_state.duplex:
+    take_audio()
+    if st.session_state.playing:
+        # MP3 frames can be concatenated, so the whole reply plays back gaplessly and stays replayable
+        audio_placeholder.audio(get_audio_store().get_many(st.session_state.playing), format="audio/mp3")
 
 # Chat container for history
 chat_container = st.container()
 with chat_container:
-    for message in st.session_state.messages:
+    for message in st.session_state.session.messages:
         with st.chat_message(message["role"]):
             st.write(message["content"])
 
 # Function to process user input (both text and voice)
-def process_user_input(user_text):
+def process_user_input(user_text, lang=None, turn=None):
     """Process user input and generate bot response"""
+    if turn is None:
+        turn = start_turn("text")
+    try:
+        return respond_to(user_text, lang, turn)
+    finally:
+        # Background speech holds the turn open until it has finished
+        turn.release()
+
+def respond_to(user_text, lang, turn):
+    """Show the user's message, then produce, show and speak the reply."""
+    # Resolve the language once per turn and carry it through the pipeline
+    lang = lang or resolve_language(user_text, turn)
+    turn.set(language=lang)
+    
     # Display user message
     with st.chat_message("user"):
         st.write(user_text)
     
     # Add to history
-    st.session_state.messages.append({"role": "user", "content": user_text})
+    st.session_state.session.add_message("user", user_text)
+    
+    if st.session_state.stream_responses:
+        # Render tokens as they arrive; sentences are spoken while streaming
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            bot_response = stream_bot_response(user_text, placeholder, lang, turn)
+        
+        st.session_state.session.add_message("assistant", bot_response)
+        return bot_response
     
     # Get bot response
     with st.spinner("Thinking..."):
-        bot_response = get_bot_response(user_text)
+        bot_response = get_bot_response(user_text, lang, turn)
     
     # Display bot message
     with st.chat_message("assistant"):
         st.write(bot_response)
     
     # Add to history
-    st.session_state.messages.append({"role": "assistant", "content": bot_response})
+    st.session_state.session.add_message("assistant", bot_response)
     
     # Speak response
-    speak_in_background(bot_response)
+    speak_in_background(bot_response, lang, turn)
     
     return bot_response
 
+def process_recording(recording, sample_rate, turn):
+    """Transcribe a recording and answer it as a voice turn."""
+    if SAVE_DEBUG_AUDIO:
+        save_audio(recording, sample_rate)
+    
+    # Trim silence and pre-encode FLAC, then hand the buffer straight to the recognizer
+    audio_data, st.session_state.last_upload = get_pipeline().preprocess(recording, sample_rate, turn)
+    user_text, lang = transcribe_audio(audio_data, turn)
+    
+    # Process the transcribed text (the recognizer already knows its language)
+    return process_user_input(user_text, lang, turn)
+
 # Text input for chat
 with st.container():
     st.write("### Type your message")
@@ -561,16 +642,24 @@ col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
     # Mic button
     button_text = "🎤 Speak" if st.session_state.audio_recorder_state == "stopped" else "🔴 Recording..."
-    if st.button(button_text, type="primary", disabled=st.session_state.audio_recorder_state == "recording"):
-        # Record audio
-        recording, sample_rate = record_audio()
-        audio_file = save_audio(recording, sample_rate)
+    # In continuous mode the microphone is already open
+    recording_busy = st.session_state.audio_recorder_state == "recording" or st.session_state.duplex
+    if st.button(button_text, type="primary", disabled=recording_busy):
+        turn = start_turn("voice")
         
-        # Transcribe
-        user_text = transcribe_audio(audio_file)
+        # Record audio
+        with turn.span("record", vad=st.session_state.vad_capture) as span:
+            if st.session_state.vad_capture:
+                recording, sample_rate = record_until_silence()
+            else:
+                recording, sample_rate = record_audio()
+            span.set(audio_seconds=round(len(recording) / sample_rate, 2))
         
-        # Process the transcribed text
-        process_user_input(user_text)
+        if len(recording) == 0:
+            turn.release()
+            st.warning("No speech detected. Please try again.")
+        else:
+            process_recording(recording, sample_rate, turn)
 
 with col2:
     # Stop speaking button
@@ -581,7 +670,8 @@ with col2:
 with col3:
     # Clear chat button
     if st.button("🗑️ Clear Chat"):
-        st.session_state.messages = []
+        st.session_state.session.clear()
+        reset_player()
         st.rerun()
 
 # Add some instructions at the bottom
@@ -596,6 +686,11 @@ with st.expander("ℹ️ How to use"):
     2. Speak clearly into your microphone (English or Bengali)
     3. Wait for the response
     
+    **Continuous Conversation:**
+    1. Turn on "Continuous conversation" in the sidebar
+    2. Just talk; each thing you say is answered
+    3. Start talking while the bot speaks to interrupt it
+    
     **Language Selection:**
     - Use the sidebar to select your preferred language
     - Auto Detect will try to determine the language from your input
@@ -605,3 +700,24 @@ with st.expander("ℹ️ How to use"):
     
     **Note:** Make sure your microphone is working and allowed in your browser.
     """)
+
+# Continuous conversation: listen for the next utterance once the page has rendered
+if st.session_state.duplex:
+    try:
+        listener = get_listener()
+    except Exception as e:
+        st.error(f"Could not open the microphone: {e}")
+        st.session_state.duplex = False
+    else:
+        status = st.empty()
+        utterance = wait_for_utterance(listener, audio_placeholder, status)
+        if utterance is not None:
+            recording, info = utterance
+            status.empty()
+            listener.interrupted.clear()
+            # The utterance was captured while waiting, so there is no record stage to time
+            turn = start_turn("voice", duplex=True, audio_seconds=round(len(recording) / listener.sample_rate, 2), **info)
+            process_recording(recording, listener.sample_rate, turn)
+        st.rerun()
+else:
+    stop_listener()
@@ -0,0 +1,8 @@
+"""
+Streamlit-free voice chatbot pipeline: speech recognition, intent routing,
+LLM responses and speech synthesis shared by many concurrent sessions.
+"""
+from .pipeline import Pipeline, ResponseStream
+from .session import SessionState, SessionStore
+
+__all__ = ["Pipeline", "ResponseStream", "SessionState", "SessionStore"]
@@ -0,0 +1,213 @@
+"""
+Session-scoped store for synthesized audio waiting to be played.
+Speech jobs publish MP3 clips for their session and the UI takes them on
+its next rerun. Clips are reference counted and freed when the last holder
+releases them. They stay in memory up to a process-wide byte budget, and
+only the least recently used clips beyond it are spilled to temp files.
+Each session is capped too, so audio nobody collects (an idle tab) is
+evicted instead of piling up.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Clip:
+    """One stored audio buffer, in memory or spilled to a temp file."""
+
+    def __init__(self, session_id, data):
+        self.session_id = session_id
+        self.size = len(data)
+        self.data = data
+        self.path = None
+        self.refs = 1
+        self.used = time.monotonic()
+
+
+class AudioStore:
+    """Reference-counted audio clips per session, in memory up to a byte budget."""
+
+    def __init__(self, memory_budget=32 * 1024 * 1024, session_max_bytes=8 * 1024 * 1024,
+                 ttl=3600.0):
+        self.memory_budget = memory_budget
+        self.session_max_bytes = session_max_bytes
+        # Clips untouched for this long belong to sessions that went away
+        self.ttl = ttl
+        self._directory = None  # created on the first spill
+        self._clips = OrderedDict()  # clip id -> Clip, least recently used first
+        self._pending = {}           # session_id -> deque of published clip ids
+        self._session_bytes = {}
+        self._memory_bytes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {"spills": 0, "evictions": 0, "expired": 0}
+
+    def put(self, session_id, data):
+        """Store a clip for a session and return its id; the caller holds one reference."""
+        data = bytes(data)
+        with self._lock:
+            self._expire()
+            clip_id = next(self._ids)
+            self._clips[clip_id] = Clip(session_id, data)
+            self._memory_bytes += len(data)
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + len(data)
+            self._evict_session(session_id, keep=clip_id)
+            self._spill()
+        return clip_id
+
+    def publish(self, session_id, data):
+        """Store a clip and queue it for the session's player; the queue holds the reference."""
+        clip_id = self.put(session_id, data)
+        with self._lock:
+            if clip_id in self._clips:
+                self._pending.setdefault(session_id, deque()).append(clip_id)
+        return clip_id
+
+    def take(self, session_id):
+        """Return the ids of clips published for a session since the last call, oldest first.
+
+        The caller takes over their references and must release them.
+        """
+        with self._lock:
+            pending = self._pending.pop(session_id, None)
+            return [clip_id for clip_id in pending or () if clip_id in self._clips]
+
+    def has_pending(self, session_id):
+        """True if clips were published for a session and not taken yet."""
+        with self._lock:
+            return any(clip_id in self._clips for clip_id in self._pending.get(session_id, ()))
+
+    def discard_pending(self, session_id):
+        """Release the session's clips that have not been taken yet (stale speech)."""
+        for clip_id in self.take(session_id):
+            self.release(clip_id)
+
+    def get(self, clip_id):
+        """Return a clip's bytes, or None if it was released or evicted."""
+        with self._lock:
+            clip = self._clips.get(clip_id)
+            if clip is None:
+                return None
+            clip.used = time.monotonic()
+            self._clips.move_to_end(clip_id)
+            if clip.data is not None:
+                return clip.data
+            path = clip.path
+        try:
+            with open(path, "rb") as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    def get_many(self, clip_ids):
+        """Concatenate the bytes of several clips, skipping any that are gone (MP3 frames join cleanly)."""
+        return b"".join(data for data in map(self.get, clip_ids) if data is not None)
+
+    def acquire(self, clip_id):
+        """Take another reference to a clip; returns False if it is gone."""
+        with self._lock:
+            clip = self._clips.get(clip_id)
+            if clip is None:
+                return False
+            clip.refs += 1
+            return True
+
+    def release(self, clip_id):
+        """Drop a reference; the clip is freed when none are left."""
+        with self._lock:
+            clip = self._clips.get(clip_id)
+            if clip is None:
+                return
+            clip.refs -= 1
+            if clip.refs <= 0:
+                self._remove(clip_id)
+
+    def release_all(self, clip_ids):
+        for clip_id in clip_ids:
+            self.release(clip_id)
+
+    def stats(self):
+        with self._lock:
+            spilled = [clip for clip in self._clips.values() if clip.data is None]
+            return dict(
+                self._stats,
+                clips=len(self._clips),
+                sessions=len(self._session_bytes),
+                memory_bytes=self._memory_bytes,
+                spilled_clips=len(spilled),
+                spilled_bytes=sum(clip.size for clip in spilled)
+            )
+
+    def close(self):
+        """Free every clip and delete the spill directory."""
+        with self._lock:
+            for clip_id in list(self._clips):
+                self._remove(clip_id)
+            self._pending.clear()
+            if self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+                self._directory = None
+
+    def _remove(self, clip_id):
+        # Caller holds the lock
+        clip = self._clips.pop(clip_id)
+        if clip.data is not None:
+            self._memory_bytes -= clip.size
+        elif clip.path is not None:
+            try:
+                os.unlink(clip.path)
+            except OSError:
+                pass
+        remaining = self._session_bytes.get(clip.session_id, 0) - clip.size
+        if remaining > 0:
+            self._session_bytes[clip.session_id] = remaining
+        else:
+            self._session_bytes.pop(clip.session_id, None)
+
+    def _evict_session(self, session_id, keep):
+        # Caller holds the lock; the session's least recently used clips go first, the new one stays
+        if self._session_bytes[session_id] <= self.session_max_bytes:
+            return
+        for clip_id, clip in list(self._clips.items()):
+            if self._session_bytes.get(session_id, 0) <= self.session_max_bytes:
+                break
+            if clip.session_id == session_id and clip_id != keep:
+                self._remove(clip_id)
+                self._stats["evictions"] += 1
+
+    def _expire(self):
+        # Caller holds the lock; clips are in least recently used order
+        cutoff = time.monotonic() - self.ttl
+        while self._clips:
+            clip_id, clip = next(iter(self._clips.items()))
+            if clip.used >= cutoff:
+                break
+            self._remove(clip_id)
+            self._stats["expired"] += 1
+        # Forget the queues of sessions with nothing left
+        for session_id in [sid for sid in self._pending if sid not in self._session_bytes]:
+            del self._pending[session_id]
+
+    def _spill(self):
+        # Caller holds the lock; write the least recently used clips to disk until within budget
+        if self._memory_bytes <= self.memory_budget:
+            return
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="voicebot-audio-")
+            atexit.register(self.close)
+        for clip in self._clips.values():
+            if self._memory_bytes <= self.memory_budget:
+                break
+            if clip.data is None:
+                continue
+            fd, path = tempfile.mkstemp(suffix=".mp3", dir=self._directory)
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(clip.data)
+            clip.path, clip.data = path, None
+            self._memory_bytes -= clip.size
+            self._stats["spills"] += 1
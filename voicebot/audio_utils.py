@@ -0,0 +1,63 @@
+"""
+In-memory audio conversions between the microphone buffer and the recognizer.
+"""
+import numpy as np
+
+
+def to_pcm16(recording):
+    """Convert a float32 recording in [-1, 1] to little-endian int16 PCM bytes."""
+    samples = np.asarray(recording, dtype=np.float32).reshape(-1)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def from_pcm16(data):
+    """Convert little-endian int16 PCM bytes to float32 samples in [-1, 1]."""
+    usable = len(data) - len(data) % 2
+    return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+# MPEG audio Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates by MPEG version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def mp3_duration(data):
+    """Return the playback length in seconds of MP3 bytes by walking the frame headers."""
+    position = 0
+    # Skip an ID3v2 tag if present (its size is a 28-bit syncsafe integer)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        position = 10 + size
+
+    duration = 0.0
+    while position + 4 <= len(data):
+        b1, b2 = data[position + 1], data[position + 2]
+        version = (b1 >> 3) & 0x03
+        layer = (b1 >> 1) & 0x03
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 0x03
+
+        # Resynchronize on anything that is not a valid Layer III frame header
+        if (data[position] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or layer != 1
+                or bitrate_index in (0, 15) or rate_index == 3):
+            position += 1
+            continue
+
+        mpeg1 = version == 3
+        bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        padding = (b2 >> 1) & 0x01
+
+        duration += (1152 if mpeg1 else 576) / sample_rate
+        position += (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+    return duration
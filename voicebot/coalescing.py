@@ -0,0 +1,170 @@
+"""
+In-flight request coalescing.
+When several sessions ask the same thing at the same time (same normalized
+prompt, language, model and context, i.e. the same response-cache key),
+only the first request goes upstream; the others wait for it and receive
+the same result. Streams are shared chunk by chunk, so every listener
+hears the answer as it is generated.
+"""
+import threading
+import weakref
+
+from .llm_stream import StreamError
+
+
+class StreamAbandoned(StreamError):
+    """The shared stream was closed because every other reader stopped early."""
+
+
+class Flight:
+    """One upstream call and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SharedStream:
+    """An iterator fanned out to several readers.
+
+    Whichever reader needs a chunk that has not arrived yet pulls it from
+    the upstream iterator; the others replay the buffered chunks. A reader
+    counts from its first next(), and the upstream is closed if every
+    reader that started stops early.
+    """
+
+    def __init__(self, factory, on_finish):
+        self._factory = factory
+        self._on_finish = on_finish
+        self._source = None
+        self._chunks = []
+        self._error = None
+        self.finished = False
+        self._readers = 0
+        self._lock = threading.Lock()  # guards the buffer and reader count
+        self._pull = threading.Lock()  # one reader advances the upstream at a time
+
+    def attach(self):
+        return self._read()
+
+    def _read(self):
+        # Counted here rather than in attach(): a reader that is never iterated never runs its finally
+        with self._lock:
+            self._readers += 1
+        index = 0
+        try:
+            while True:
+                with self._lock:
+                    if index < len(self._chunks):
+                        chunk = self._chunks[index]
+                    elif self.finished:
+                        if self._error is not None:
+                            raise self._error
+                        return
+                    else:
+                        chunk = None
+                if chunk is not None:
+                    index += 1
+                    yield chunk
+                    continue
+                with self._pull:
+                    self._advance(index)
+        finally:
+            self._detach()
+
+    def _advance(self, index):
+        # Caller holds the pull lock; another reader may already have fetched the chunk
+        with self._lock:
+            if index < len(self._chunks) or self.finished:
+                return
+        try:
+            if self._source is None:
+                self._source = iter(self._factory())
+            chunk = next(self._source)
+        except StopIteration:
+            self._finish()
+        except Exception as e:
+            self._finish(e)
+        else:
+            with self._lock:
+                self._chunks.append(chunk)
+
+    def _finish(self, error=None):
+        with self._lock:
+            if self.finished:
+                return
+            self._error = error
+            self.finished = True
+        self._on_finish(self)
+
+    def _detach(self):
+        with self._lock:
+            self._readers -= 1
+            abandoned = self._readers == 0 and not self.finished
+        if abandoned:
+            with self._pull:
+                if self._source is not None:
+                    self._source.close()
+            self._finish(StreamAbandoned("The shared response was abandoned; please ask again."))
+
+
+class Coalescer:
+    """Single-flight calls and shared streams keyed by request identity."""
+
+    def __init__(self):
+        self._flights = {}
+        # A stream whose readers were all dropped unread is garbage collected, and forgotten with it
+        self._streams = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._counters = {"upstream": 0, "coalesced": 0}
+
+    def call(self, key, fn):
+        """Return (fn(), shared) where concurrent calls with the same key share one fn() call."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self._counters["upstream"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stream(self, key, factory):
+        """Return (iterator, shared): a reader of the in-flight stream for `key`, started with factory() if none."""
+        with self._lock:
+            shared = self._streams.get(key)
+            leader = shared is None or shared.finished
+            if leader:
+                shared = self._streams[key] = SharedStream(factory, lambda done: self._forget(key, done))
+                self._counters["upstream"] += 1
+            else:
+                self._counters["coalesced"] += 1
+            reader = shared.attach()
+        return reader, not leader
+
+    def _forget(self, key, shared):
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._flights) + len(self._streams))
@@ -0,0 +1,82 @@
+"""
+Settings for the voice chatbot pipeline, read from the environment (.env).
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OpenRouter endpoint and models (the base URL can point at a local fake server).
+# OPENROUTER_MODELS is a comma-separated list in order of preference; slow or
+# failing requests are hedged or retried on the next model.
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_MODELS = [
+    model.strip()
+    for model in os.environ.get("OPENROUTER_MODELS", "meta-llama/llama-4-maverick:free").split(",")
+    if model.strip()
+]
+MAX_TOKENS = 1024
+
+# Seconds to wait for a model's first token before hedging: this until it has
+# a latency history, then its recent p95 (capped at HEDGE_MAX_DEADLINE)
+HEDGE_DEADLINE = float(os.environ.get("HEDGE_DEADLINE", "3"))
+HEDGE_MAX_DEADLINE = float(os.environ.get("HEDGE_MAX_DEADLINE", "10"))
+
+# Request quota of the shared API key (0 disables limiting; free models allow
+# 20 per minute). Requests beyond it queue fairly across sessions, up to a
+# queue length and wait limit.
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "20"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "10"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "100"))
+LLM_MAX_WAIT = float(os.environ.get("LLM_MAX_WAIT", "30"))
+
+# HTTP timeouts (seconds) and retry budget for OpenRouter calls
+OPENROUTER_CONNECT_TIMEOUT = float(os.environ.get("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.environ.get("OPENROUTER_READ_TIMEOUT", "60"))
+OPENROUTER_MAX_RETRIES = int(os.environ.get("OPENROUTER_MAX_RETRIES", "4"))
+
+# Instruction added to requests that should be answered in Bengali
+BENGALI_SYSTEM_MESSAGE = "Please respond in Bengali (Bangla) language."
+
+# Token budget for the conversation history sent with each request
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Local caches and the email outbox live here
+CACHE_DIR = os.environ.get("VOICEBOT_CACHE_DIR", "cache")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+TTS_CACHE_MAX_MB = float(os.environ.get("TTS_CACHE_MAX_MB", "64"))
+
+# Synthesized audio waiting to be played is kept in memory up to this budget
+# (beyond it the least recently used clips go to temp files), and each
+# session may hold at most AUDIO_STORE_SESSION_MB
+AUDIO_STORE_MEMORY_MB = float(os.environ.get("AUDIO_STORE_MEMORY_MB", "32"))
+AUDIO_STORE_SESSION_MB = float(os.environ.get("AUDIO_STORE_SESSION_MB", "8"))
+
+# Voice activity detection: trailing silence that ends a turn and hard length limit
+VAD_SILENCE_MS = int(os.environ.get("VAD_SILENCE_MS", "800"))
+VAD_MAX_SECONDS = float(os.environ.get("VAD_MAX_SECONDS", "15"))
+
+# Continuous conversation: the microphone stays open while the bot speaks, and
+# this much speech above a raised level (the bot's voice reaches the mic too)
+# interrupts it
+DUPLEX = os.environ.get("DUPLEX", "").lower() in ("1", "true", "yes")
+BARGE_IN_THRESHOLD = float(os.environ.get("BARGE_IN_THRESHOLD", "0.03"))
+BARGE_IN_MIN_SPEECH_MS = int(os.environ.get("BARGE_IN_MIN_SPEECH_MS", "60"))
+
+# Clean up recordings before recognition: trim leading/trailing silence and
+# encode FLAC once in-process (needs soundfile) instead of once per request
+TRIM_SILENCE = os.environ.get("TRIM_SILENCE", "1").lower() in ("1", "true", "yes")
+PREENCODE_FLAC = os.environ.get("PREENCODE_FLAC", "1").lower() in ("1", "true", "yes")
+
+# Write each recording to temp/ as well (debugging only; audio otherwise stays in memory)
+SAVE_DEBUG_AUDIO = os.environ.get("SAVE_DEBUG_AUDIO", "").lower() in ("1", "true", "yes")
+
+# Per-stage latency tracing: rolling percentiles plus one JSON line per turn
+# (an empty TRACE_PATH keeps traces in memory only)
+TRACING = os.environ.get("TRACING", "1").lower() in ("1", "true", "yes")
+TRACE_PATH = os.environ.get("TRACE_PATH", os.path.join("traces", "turns.jsonl"))
+
+# Sample rate of microphone audio (mono, 16-bit PCM over the WebSocket API)
+SAMPLE_RATE = 16000
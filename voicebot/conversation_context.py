@@ -0,0 +1,114 @@
+"""
+Token-budgeted conversation context for multi-turn chat.
+Recent turns are sent verbatim up to a token budget. Older turns are folded
+into a rolling summary that is only recomputed when the window slides, so
+the prompt size per request stays bounded however long the session runs.
+"""
+import math
+import re
+
+# Characters per token for the local tokenizer approximation. BPE vocabularies
+# pack English at roughly four characters per token, while Bengali script
+# usually costs a token per one or two characters.
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 1.5
+
+# Fixed per-message cost of the chat format (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(text):
+    """Approximate the token count of a text without a real tokenizer."""
+    other = len(NON_ASCII.findall(text))
+    ascii_chars = len(text) - other
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN)
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens, keep="end"):
+    """Trim text on word boundaries until it fits in max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    while words and estimate_tokens(" ".join(words)) > max_tokens:
+        # Drop in chunks so long texts are trimmed quickly
+        drop = max(1, len(words) // 10)
+        words = words[drop:] if keep == "end" else words[:-drop]
+    return " ".join(words)
+
+
+def extractive_summary(previous_summary, turns, max_tokens):
+    """Fold turns into a summary by keeping the first sentence of each one.
+
+    The newest material is kept when the summary outgrows its budget.
+    """
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        first_sentence = SENTENCE_END.split(turn["content"].strip(), maxsplit=1)[0]
+        speaker = "User" if turn["role"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {first_sentence}")
+    return truncate_to_tokens(" ".join(lines), max_tokens, keep="end")
+
+
+class ContextWindow:
+    """Sliding window over a session's messages with a rolling summary of what fell out."""
+
+    def __init__(self, budget_tokens=1500, summary_tokens=250, low_water=0.6, summarize=None):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        # When the window overflows it slides down to this fraction of the
+        # budget, so the summary is recomputed every few turns, not every turn
+        self.low_water = low_water
+        self.summarize = summarize or extractive_summary
+        self.reset()
+
+    def reset(self):
+        self.summary = ""
+        self.window_start = 0
+
+    def build(self, history, prompt, system_message=None):
+        """Return the chat messages for a request: system, summary, recent turns, prompt."""
+        # History was cleared or replaced; start over
+        if self.window_start > len(history):
+            self.reset()
+
+        fixed = [{"role": "user", "content": prompt}]
+        if system_message:
+            fixed.insert(0, {"role": "system", "content": system_message})
+
+        summary_reserve = self.summary_tokens + estimate_tokens(SUMMARY_PREFIX) + MESSAGE_OVERHEAD_TOKENS
+        history_budget = self.budget_tokens - summary_reserve - sum(message_tokens(m) for m in fixed)
+        window = history[self.window_start:]
+        window_tokens = sum(message_tokens(m) for m in window)
+
+        if window_tokens > history_budget:
+            # Slide the window forward and fold the evicted turns into the summary
+            target = max(0, int(history_budget * self.low_water))
+            start = self.window_start
+            while start < len(history) and window_tokens > target:
+                window_tokens -= message_tokens(history[start])
+                start += 1
+            evicted = history[self.window_start:start]
+            summary = self.summarize(self.summary, evicted, self.summary_tokens)
+            self.summary = truncate_to_tokens(summary, self.summary_tokens)
+            self.window_start = start
+            window = history[start:]
+
+        messages = [{"role": m["role"], "content": m["content"]} for m in window]
+        if self.summary:
+            messages.insert(0, {
+                "role": "system",
+                "content": SUMMARY_PREFIX + self.summary
+            })
+        if system_message:
+            messages.insert(0, fixed[0])
+        messages.append(fixed[-1])
+        return messages
@@ -0,0 +1,200 @@
+"""
+Full-duplex listening with barge-in.
+The microphone stays open while the bot thinks and speaks. Its own voice
+leaks into the microphone, so while it talks a VAD with a raised threshold
+must hear a short run of speech before the user counts as talking over it;
+the bot is then interrupted at once and the interrupting utterance,
+including the audio just before the onset, becomes the next turn.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .vad import UtteranceCapture, VoiceActivityDetector, frame_signal
+
+
+class BargeInDetector:
+    """Confirms user speech once `min_speech_ms` of consecutive frames pass the VAD."""
+
+    def __init__(self, vad, min_speech_ms=60):
+        self.vad = vad
+        frame_ms = 1000 * vad.frame_length / vad.sample_rate
+        self.min_frames = max(1, round(min_speech_ms / frame_ms))
+        self._run = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def feed(self, block):
+        """Add a block of samples; returns True if speech was confirmed in it."""
+        samples = np.concatenate([self._pending, np.asarray(block, dtype=np.float32).reshape(-1)])
+        frames = frame_signal(samples, self.vad.frame_length)
+        self._pending = samples[len(frames) * self.vad.frame_length:]
+        if not len(frames):
+            return False
+
+        confirmed = False
+        for is_speech in self.vad.classify(frames):
+            self._run = self._run + 1 if is_speech else 0
+            if self._run >= self.min_frames:
+                confirmed = True
+        return confirmed
+
+    def reset(self):
+        self._run = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+
+
+class DuplexListener:
+    """Keeps the microphone open, turning speech into utterances and interrupting the bot when talked over.
+
+    `is_speaking()` tells whether the bot is talking (or about to), and
+    `playback_until` extends that to a clip the page is still playing;
+    meanwhile a capture only starts once the barge-in detector confirms
+    speech, and `interrupt()` is called right away on the listener thread. If
+    nobody asks for utterances for `idle_timeout` seconds (the browser
+    session went away), the listener closes the microphone by itself.
+    """
+
+    def __init__(self, is_speaking, interrupt, sample_rate=16000, block_ms=30, silence_ms=800,
+                 max_seconds=15.0, barge_in_threshold=0.03, min_speech_ms=60, pre_roll_ms=300,
+                 idle_timeout=60.0, stream_factory=None):
+        self.is_speaking = is_speaking
+        self.interrupt = interrupt
+        self.sample_rate = sample_rate
+        self.block_size = int(sample_rate * block_ms / 1000)
+        self.silence_ms = silence_ms
+        self.max_seconds = max_seconds
+        self.idle_timeout = idle_timeout
+        self.detector = BargeInDetector(
+            VoiceActivityDetector(sample_rate, energy_threshold=barge_in_threshold),
+            min_speech_ms
+        )
+        # Set on every barge-in; the UI clears it once it has stopped its own playback
+        self.interrupted = threading.Event()
+        # Monotonic time until which the UI's player is busy, after the speech job may have finished
+        self.playback_until = 0.0
+        self._stream_factory = stream_factory
+        self._recent = deque(maxlen=max(1, int(pre_roll_ms / block_ms)))
+        self._blocks = queue.Queue()
+        self._utterances = queue.Queue()
+        self._stop = threading.Event()
+        self._stream = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"utterances": 0, "barge_ins": 0, "last_reaction_ms": None, "max_reaction_ms": None}
+        self._capture = self._new_capture()
+        self._polled = time.monotonic()
+
+    def start(self):
+        """Open the microphone and start listening."""
+        stream_factory = self._stream_factory
+        if stream_factory is None:
+            import sounddevice as sd
+            stream_factory = sd.InputStream
+        self._stream = stream_factory(samplerate=self.sample_rate, channels=1, dtype="float32",
+                                      blocksize=self.block_size, callback=self._callback)
+        self._stream.start()
+        self._thread = threading.Thread(target=self._run, name="duplex-listener", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Close the microphone; an utterance in progress is dropped."""
+        self._stop.set()
+        self._close_stream()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def _close_stream(self):
+        with self._lock:
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def listening(self):
+        """True while an utterance is being captured."""
+        return self._capture.started
+
+    def next_utterance(self, timeout=None):
+        """Return the next (audio, info) utterance, or None if there is none within `timeout`."""
+        self._polled = time.monotonic()
+        try:
+            return self._utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _callback(self, indata, frames, time_info, status):
+        # Runs on the audio thread: timestamp, copy and hand off, never block here
+        self._blocks.put((time.perf_counter(), indata[:, 0].copy()))
+
+    def _bot_speaking(self):
+        return time.monotonic() < self.playback_until or self.is_speaking()
+
+    def _new_capture(self):
+        return UtteranceCapture(
+            VoiceActivityDetector(self.sample_rate),
+            silence_ms=self.silence_ms,
+            max_seconds=self.max_seconds,
+            wait_seconds=60.0
+        )
+
+    def _run(self):
+        info = {"barge_in": False}
+        while not self._stop.is_set():
+            if time.monotonic() - self._polled > self.idle_timeout:
+                # Nobody is waiting for utterances any more
+                self.stop()
+                return
+            try:
+                received, block = self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if self._capture.started or not self._bot_speaking():
+                self.detector.reset()
+                self._recent.clear()
+                blocks = [block]
+            else:
+                # Only confirmed speech over the bot's voice starts a turn
+                self._recent.append(block)
+                if not self.detector.feed(block):
+                    continue
+                self.interrupt()
+                self.playback_until = 0.0
+                reaction_ms = round((time.perf_counter() - received) * 1000, 1)
+                self.interrupted.set()
+                with self._lock:
+                    self._stats["barge_ins"] += 1
+                    self._stats["last_reaction_ms"] = reaction_ms
+                    self._stats["max_reaction_ms"] = max(self._stats["max_reaction_ms"] or 0, reaction_ms)
+                info = {"barge_in": True, "reaction_ms": reaction_ms}
+                # Start the new turn from the audio heard just before the onset
+                self._capture = self._new_capture()
+                blocks = list(self._recent)
+                self._recent.clear()
+                self.detector.reset()
+
+            for pending in blocks:
+                if self._capture.feed(pending):
+                    break
+            if not self._capture.done:
+                continue
+
+            audio = self._capture.audio()
+            if len(audio):
+                self._utterances.put((audio, info))
+                with self._lock:
+                    self._stats["utterances"] += 1
+            self._capture = self._new_capture()
+            info = {"barge_in": False}
@@ -0,0 +1,189 @@
+"""
+Durable, asynchronous email outbox.
+The assistant enqueues emails into a SQLite table and answers immediately;
+a background worker drains the table in batches with a concurrency limit
+and retries failed messages with exponential backoff. Messages survive
+restarts, and their status can be shown in the UI. Several processes (the
+Streamlit app and the server) may share one database: batches are claimed
+atomically under a lease, and only messages whose lease has expired are
+taken over from a process that died mid-send.
+"""
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class EmailOutbox:
+    """SQLite-backed outbox with a background delivery worker."""
+
+    def __init__(self, send_batch, db_path="cache/outbox.sqlite3", batch_size=10,
+                 concurrency=2, max_attempts=5, backoff_base=2.0, backoff_max=300.0, linger=0.1,
+                 lease_seconds=300.0):
+        # send_batch([(recipient, subject, body), ...]) -> [(message_id, error), ...]
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Short pause after a wakeup so a burst of messages goes out as one batch
+        self.linger = linger
+        # A claimed batch belongs to this outbox until the lease runs out
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, "
+            "recipient TEXT NOT NULL, subject TEXT NOT NULL, body TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "last_error TEXT, message_id TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, next_attempt_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        if "owner" not in columns:
+            # Databases created before leases were added
+            self._db.execute("ALTER TABLE outbox ADD COLUMN owner TEXT")
+            self._db.execute("ALTER TABLE outbox ADD COLUMN lease_until REAL")
+            # Their in-flight messages have no lease; let them be claimed again
+            self._db.execute("UPDATE outbox SET lease_until = 0 WHERE status = ?", (SENDING,))
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+        # The semaphore caps in-flight batches so claiming never outruns delivery
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox")
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, session_id, recipient, subject, body):
+        """Queue an email for delivery and return its outbox id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (session_id, recipient, subject, body, status, "
+                "created_at, updated_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, recipient, subject, body, QUEUED, now, now, now)
+            )
+            self._db.commit()
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def statuses(self, session_id=None, limit=20):
+        """Return recent outbox entries (newest first) as dicts."""
+        query = ("SELECT id, recipient, subject, status, attempts, last_error, updated_at "
+                 "FROM outbox")
+        params = ()
+        if session_id is not None:
+            query += " WHERE session_id = ?"
+            params = (session_id,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, params + (limit,)).fetchall()
+        keys = ("id", "recipient", "subject", "status", "attempts", "last_error", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _claim_batch(self):
+        # Due messages, plus messages whose sender died without recording a result
+        now = time.time()
+        claimable = "((status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until < ?))"
+        with self._lock:
+            try:
+                # The write lock is taken up front, so no other process can claim the same rows
+                self._db.execute("BEGIN IMMEDIATE")
+                rows = self._db.execute(
+                    f"SELECT id, recipient, subject, body, attempts FROM outbox WHERE {claimable} "
+                    "ORDER BY id LIMIT ?",
+                    (QUEUED, now, SENDING, now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    self._db.executemany(
+                        f"UPDATE outbox SET status = ?, owner = ?, lease_until = ?, updated_at = ? "
+                        f"WHERE id = ? AND {claimable}",
+                        [(SENDING, self.owner, now + self.lease_seconds, now, row[0], QUEUED, now, SENDING, now)
+                         for row in rows]
+                    )
+                self._db.commit()
+            except sqlite3.OperationalError as e:
+                # Another process held the database for longer than the busy timeout; try again later
+                self._db.rollback()
+                print(f"Outbox claim failed: {e}")
+                return []
+        return rows
+
+    def _next_due_in(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(CASE WHEN status = ? THEN next_attempt_at ELSE lease_until END) "
+                "FROM outbox WHERE status IN (?, ?)", (QUEUED, QUEUED, SENDING)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            batch = self._claim_batch()
+            if batch:
+                self._executor.submit(self._deliver, batch)
+                continue
+
+            self._slots.release()
+            # Sleep until a new message arrives or the next retry is due
+            woken = self._wakeup.wait(timeout=self._next_due_in())
+            self._wakeup.clear()
+            if woken and self.linger:
+                time.sleep(self.linger)
+
+    def _deliver(self, batch):
+        try:
+            try:
+                results = self.send_batch([(row[1], row[2], row[3]) for row in batch])
+            except Exception as e:
+                # The whole batch failed (auth, network); retry every message
+                results = [(None, e)] * len(batch)
+            self._record(batch, results)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    def _record(self, batch, results):
+        now = time.time()
+        updates = []
+        for row, (message_id, error) in zip(batch, results):
+            outbox_id, attempts = row[0], row[4] + 1
+            if error is None:
+                updates.append((SENT, attempts, None, message_id, now, now, outbox_id, self.owner))
+            elif attempts >= self.max_attempts:
+                updates.append((FAILED, attempts, str(error), None, now, now, outbox_id, self.owner))
+            else:
+                # Jittered exponential backoff before the next attempt
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempts)) * random.uniform(0.5, 1.0)
+                updates.append((QUEUED, attempts, str(error), None, now, now + delay, outbox_id, self.owner))
+
+        with self._lock:
+            # Only rows this outbox still owns; an expired lease may have been taken over
+            self._db.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, message_id = ?, "
+                "updated_at = ?, next_attempt_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ?",
+                updates
+            )
+            self._db.commit()
@@ -0,0 +1,185 @@
+"""
+Process-level Gmail credentials and service cache.
+token.json is parsed once, tokens are refreshed shortly before they expire,
+and the Gmail service (with its discovery document) is built once. Each
+thread reuses its own authorized HTTP transport, since httplib2 connections
+must not be shared between threads. The Google client libraries are
+imported on first use, so processes that never send email don't load them.
+"""
+import base64
+import datetime
+import json
+import os
+import threading
+from email.mime.text import MIMEText
+
+# Gmail API scope
+SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+
+# Client ID from configuration
+CLIENT_ID = "900054230602-oi3h58bb73fa38k0hs7fl5fe8fn2jqrq.apps.googleusercontent.com"
+
+CLIENT_CONFIG = {
+    "installed": {
+        "client_id": CLIENT_ID,
+        "project_id": "voice-chatbot-gmail",
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "redirect_uris": ["urn:ietf:wg:oauth:2.0:oob", "http://localhost"]
+    }
+}
+
+
+class GmailAuthError(Exception):
+    """Raised when no valid Gmail credentials can be obtained."""
+
+
+def build_message(recipient, subject, message):
+    """Encode an email as the base64url 'raw' body the Gmail API expects."""
+    email_message = MIMEText(message)
+    email_message['to'] = recipient
+    email_message['subject'] = subject
+    return {'raw': base64.urlsafe_b64encode(email_message.as_bytes()).decode()}
+
+
+class GmailClient:
+    """Thread-safe cache of Gmail credentials, service object and per-thread transports."""
+
+    def __init__(self, token_path='token.json', credentials_path='credentials.json',
+                 http_factory=None, refresh_margin=300, credentials=None):
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        # Builds the underlying transport (httplib2.Http by default); tests can
+        # return a stub such as HttpMockSequence
+        self.http_factory = http_factory
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self._creds = credentials
+        self._service = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def credentials(self):
+        """Return valid credentials, refreshing them if they expire soon."""
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+
+            if self._needs_refresh(self._creds):
+                if self._creds.refresh_token:
+                    from google.auth.transport.requests import Request
+                    try:
+                        self._creds.refresh(Request())
+                        self._save_credentials()
+                    except Exception as e:
+                        print(f"Error refreshing credentials: {e}")
+                        self._creds = None
+                else:
+                    self._creds = None
+
+            # If credentials still not valid, try OAuth flow
+            if self._creds is None:
+                self._creds = self._run_oauth_flow()
+            return self._creds
+
+    def service(self):
+        """Return the Gmail service, building it (and loading discovery) only once."""
+        with self._lock:
+            if self._service is None:
+                from googleapiclient.discovery import build
+                # static_discovery uses the document bundled with the client library
+                self._service = build(
+                    'gmail', 'v1',
+                    http=self.http(),
+                    cache_discovery=False,
+                    static_discovery=True
+                )
+            return self._service
+
+    def http(self):
+        """Return this thread's authorized transport, creating it on first use."""
+        creds = self.credentials()
+        http = getattr(self._local, "http", None)
+        if http is None or http.credentials is not creds:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = AuthorizedHttp(creds, http=(self.http_factory or httplib2.Http)())
+            self._local.http = http
+        return http
+
+    def send(self, recipient, subject, message):
+        """Send one email and return the Gmail message id."""
+        request = self.service().users().messages().send(
+            userId='me',
+            body=build_message(recipient, subject, message)
+        )
+        # Execute on this thread's own transport
+        response = request.execute(http=self.http())
+        return response.get('id')
+
+    def send_batch(self, emails):
+        """Send several emails in one batch HTTP request.
+
+        `emails` is a list of (recipient, subject, message) tuples. Returns a
+        list, in the same order, of (message_id, None) or (None, error).
+        """
+        service = self.service()
+        results = [(None, None)] * len(emails)
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            results[index] = (None, exception) if exception else (response.get('id'), None)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for index, (recipient, subject, message) in enumerate(emails):
+            batch.add(
+                service.users().messages().send(userId='me', body=build_message(recipient, subject, message)),
+                request_id=str(index)
+            )
+        batch.execute(http=self.http())
+        return results
+
+    def _needs_refresh(self, creds):
+        if creds is None:
+            return False
+        if not creds.valid:
+            return True
+        if creds.expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now < self.refresh_margin
+
+    def _load_credentials(self):
+        if not os.path.exists(self.token_path):
+            return None
+        from google.oauth2.credentials import Credentials
+        try:
+            with open(self.token_path) as token:
+                return Credentials.from_authorized_user_info(json.load(token), SCOPES)
+        except Exception as e:
+            print(f"Error loading credentials: {e}")
+            return None
+
+    def _save_credentials(self):
+        with open(self.token_path, 'w') as token:
+            token.write(self._creds.to_json())
+
+    def _run_oauth_flow(self):
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        try:
+            # Check if credentials.json exists first
+            if os.path.exists(self.credentials_path):
+                flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, SCOPES)
+            else:
+                # Use client ID directly if credentials.json doesn't exist
+                flow = InstalledAppFlow.from_client_config(CLIENT_CONFIG, SCOPES)
+
+            creds = flow.run_local_server(port=0)
+        except Exception as e:
+            raise GmailAuthError(f"Error during authentication: {str(e)}") from e
+
+        self._creds = creds
+        # Save the credentials for the next run
+        self._save_credentials()
+        return creds
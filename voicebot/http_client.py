@@ -0,0 +1,143 @@
+"""
+Pooled, keep-alive HTTP client for the OpenRouter API.
+A single client is shared by every Streamlit session so TCP/TLS connections
+are reused across turns, with timeouts and retries on rate limits and
+transient server errors.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class RequestCancelled(requests.RequestException):
+    """Raised when a request is cancelled while waiting to retry."""
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class OpenRouterClient:
+    """Thread-safe pooled client with timeouts and jittered exponential backoff."""
+
+    def __init__(self, base_url, api_key="", connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=4, backoff_base=0.5, backoff_max=20.0, pool_size=20):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # Retries are handled here (not by urllib3) so Retry-After and the
+        # counters apply to both normal and streaming requests
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "failures": 0}
+
+    def url(self, path):
+        """Build an absolute URL for an API path such as '/chat/completions'."""
+        return f"{self.base_url}{path}"
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential delay, never shorter than the server's Retry-After.
+
+        Returns None when the server asks for more than `backoff_max` seconds,
+        which is too long to keep a turn waiting.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    def post(self, url, cancel=None, retry=True, **kwargs):
+        """POST with retries; mirrors `requests.post` so it can be passed around in its place.
+
+        Setting the `cancel` event (e.g. when a hedged request has lost) stops
+        any further retries. With `retry` False, nothing is retried: a rate
+        limit or server error is returned and a connection error or timeout
+        raised at once (the caller has another model to try).
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+
+        while True:
+            self._count("requests")
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries or not retry:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries or not retry:
+                    if response.status_code >= 400:
+                        self._count("failures")
+                    return response
+                delay = self.backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                if delay is None:
+                    self._count("failures")
+                    return response
+                # Release the connection back to the pool before sleeping
+                response.close()
+
+            self._count("retries")
+            attempt += 1
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                raise RequestCancelled("Request cancelled")
+
+    def stats(self):
+        """Return request/retry counters and connection reuse from the urllib3 pools."""
+        with self._lock:
+            stats = dict(self._counters)
+
+        opened = 0
+        sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+
+        stats["connections_opened"] = opened
+        stats["connections_reused"] = max(0, sent - opened)
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def close(self):
+        self.session.close()
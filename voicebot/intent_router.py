@@ -0,0 +1,196 @@
+"""
+Local command routing.
+Trigger phrases for every registered intent (English and Bengali) are
+compiled into one Aho-Corasick automaton and matched in a single pass over
+the prompt. Matching intents produce structured slots and are answered
+locally, without an LLM round trip.
+"""
+import re
+import unicodedata
+from collections import deque
+
+
+def _compile(pattern, flags=0):
+    # Bengali literals are NFC-normalized like the text they are matched against
+    return re.compile(unicodedata.normalize("NFC", pattern), flags)
+
+
+# Email slot patterns, compiled once
+EMAIL_PATTERN = _compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+SUBJECT_PATTERN = _compile(r'(?:subject|বিষয়)[:\s]+([^\n.।]+)[.।]?', re.IGNORECASE)
+EMAIL_FILLER_PATTERNS = [
+    _compile(r'send\s+(?:an?\s+)?e-?mail\s+(?:to\s+)?', re.IGNORECASE),
+    _compile(r'send\s+(?:a\s+)?mail\s+(?:to\s+)?', re.IGNORECASE),
+    _compile(r'with\s+(?:the\s+)?message\s+', re.IGNORECASE),
+    _compile(r'(?:কে\s+)?(?:ই-?মেই?ল|মেইল)\s+(?:পাঠাও|পাঠান|পাঠিয়ে দাও|করো|করুন)'),
+    _compile(r'(?:বার্তা|মেসেজ)[:\s]+'),
+]
+
+EMAIL_TRIGGERS = [
+    # English
+    "send email", "send an email", "send a mail", "send mail", "send e-mail", "send an e-mail",
+    # Bengali
+    "ইমেইল পাঠাও", "ইমেইল পাঠান", "ইমেইল পাঠিয়ে দাও", "ইমেইল করো", "ইমেইল করুন",
+    "ইমেল পাঠাও", "ইমেল পাঠান", "ই-মেইল পাঠাও", "ই-মেইল পাঠান",
+    "মেইল পাঠাও", "মেইল পাঠান", "মেইল করো", "মেইল করুন",
+]
+
+DEFAULT_SUBJECT = "Message from Voice Assistant"
+
+
+def normalize(text):
+    """Canonical form for matching: NFC (stable Bengali nukta forms) and case-folded."""
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton: finds every registered phrase in one pass over a text."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = False
+
+    def add(self, phrase, value):
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(phrase), value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+
+    def find_all(self, text):
+        """Yield (start, end, value) for every phrase occurrence in the text."""
+        if not self._built:
+            self.build()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                yield index + 1 - length, index + 1, value
+
+
+def _is_word_boundary(text, start, end):
+    # Only Latin phrases need boundary checks ("resend mail" is not "send mail");
+    # Bengali triggers are full verb phrases
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    if text[start].isascii() and before.isascii() and before.isalnum():
+        return False
+    if text[end - 1].isascii() and after.isascii() and after.isalnum():
+        return False
+    return True
+
+
+class Intent:
+    """A local command: trigger phrases, a slot extractor and a handler."""
+
+    def __init__(self, name, phrases, handler, extract_slots=None, priority=0):
+        self.name = name
+        self.phrases = phrases
+        self.handler = handler
+        self.extract_slots = extract_slots or (lambda text: {})
+        self.priority = priority
+
+
+class IntentRouter:
+    """Registry of local intents matched with a single multi-pattern scan."""
+
+    def __init__(self):
+        self._intents = {}
+        self._matcher = None
+
+    def register(self, name, phrases, handler, extract_slots=None, priority=0):
+        """Register (or replace) an intent. `handler(text, slots, session)` returns the reply."""
+        self._intents[name] = Intent(name, phrases, handler, extract_slots, priority)
+        self._matcher = None
+
+    def match(self, text):
+        """Return (intent, slots) for the best matching intent, or None."""
+        if not self._intents:
+            return None
+        if self._matcher is None:
+            self._matcher = PhraseMatcher()
+            for intent in self._intents.values():
+                for phrase in intent.phrases:
+                    self._matcher.add(normalize(phrase), intent.name)
+            self._matcher.build()
+
+        normalized = normalize(text)
+        best = None
+        for start, end, name in self._matcher.find_all(normalized):
+            if not _is_word_boundary(normalized, start, end):
+                continue
+            intent = self._intents[name]
+            # Higher priority wins; among equals, the earliest mention
+            if best is None or intent.priority > best.priority:
+                best = intent
+        if best is None:
+            return None
+        return best, best.extract_slots(text)
+
+    def route(self, text, session=None):
+        """Answer the text locally if it matches an intent; otherwise return None."""
+        matched = self.match(text)
+        if matched is None:
+            return None
+        intent, slots = matched
+        return intent.handler(text, slots, session)
+
+
+def extract_email_slots(text):
+    """Extract recipient, subject and body slots from an email command.
+
+    An 'error' slot describes what is missing when the command is incomplete.
+    """
+    text = unicodedata.normalize("NFC", text)
+    email_matches = EMAIL_PATTERN.findall(text)
+
+    if not email_matches:
+        return {"error": "Could not find a valid email address in your message."}
+
+    recipient = email_matches[0]
+
+    # Try to extract subject
+    subject_match = SUBJECT_PATTERN.search(text)
+    subject = subject_match.group(1).strip() if subject_match else DEFAULT_SUBJECT
+
+    # Remove email address, subject and command words to isolate the content
+    body = text
+    for email in email_matches:
+        body = body.replace(email, "")
+    if subject_match:
+        body = body.replace(subject_match.group(0), "")
+    for pattern in EMAIL_FILLER_PATTERNS:
+        body = pattern.sub("", body)
+    body = body.strip(" \n\t,:;-")
+
+    slots = {"recipient": recipient, "subject": subject, "body": body}
+    if not body:
+        slots["error"] = "I found an email address but couldn't understand the message content."
+    return slots
@@ -0,0 +1,54 @@
+"""
+Fast, deterministic Bengali/English detection.
+Counts code points in the Unicode Bengali block (vectorized with NumPy) and
+only falls back to langdetect's probabilistic model for mixed-script text.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Unicode Bengali block
+BENGALI_START = 0x0980
+BENGALI_END = 0x09FF
+
+# Share of Bengali letters at or above which the text is Bengali, and below
+# which (but above zero) it is ambiguous mixed-script input
+BENGALI_THRESHOLD = 0.5
+AMBIGUOUS_THRESHOLD = 0.15
+
+
+def script_counts(text):
+    """Return (bengali_letters, latin_letters) in a text."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    bengali = np.count_nonzero((codes >= BENGALI_START) & (codes <= BENGALI_END))
+    folded = codes | 0x20  # fold ASCII upper case onto lower case
+    latin = np.count_nonzero((folded >= ord("a")) & (folded <= ord("z")))
+    return int(bengali), int(latin)
+
+
+def bengali_ratio(text):
+    """Fraction of the letters in a text that are Bengali."""
+    bengali, latin = script_counts(text)
+    letters = bengali + latin
+    return bengali / letters if letters else 0.0
+
+
+def _langdetect(text):
+    # Imported lazily: loading the language profiles is slow and rarely needed
+    from langdetect import DetectorFactory, LangDetectException, detect
+    DetectorFactory.seed = 0  # make langdetect deterministic
+    try:
+        return "bn" if detect(text) == "bn" else "en"
+    except LangDetectException:
+        return "en"
+
+
+@lru_cache(maxsize=4096)
+def detect_language(text):
+    """Return 'bn' for Bengali text and 'en' for everything else (memoized per text)."""
+    ratio = bengali_ratio(text)
+    if ratio >= BENGALI_THRESHOLD:
+        return "bn"
+    if ratio >= AMBIGUOUS_THRESHOLD:
+        return _langdetect(text)
+    return "en"
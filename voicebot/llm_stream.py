@@ -0,0 +1,126 @@
+"""
+Helpers for consuming OpenRouter's streaming chat-completions responses.
+OpenRouter (like OpenAI) streams completions as server-sent events (SSE),
+one JSON chunk per `data:` line, terminated by `data: [DONE]`.
+"""
+import json
+import re
+
+import requests
+
+# A sentence ends at terminal punctuation (including the Bengali danda "।")
+# followed by whitespace, or at a line break.
+SENTENCE_BOUNDARY = re.compile(r'[.!?।]+["\'”’)\]]*\s+|\n+')
+
+
+class StreamError(Exception):
+    """Raised when the provider reports an error inside the event stream."""
+
+
+def iter_sse_data(lines):
+    """Yield the data payload of each server-sent event from an iterable of lines."""
+    data_lines = []
+    for raw_line in lines:
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        line = line.rstrip("\r\n")
+
+        # A blank line terminates the current event
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+
+        # Lines starting with ':' are comments (OpenRouter uses them as keep-alives)
+        if line.startswith(":"):
+            continue
+
+        if line.startswith("data:"):
+            data = line[5:]
+            data_lines.append(data[1:] if data.startswith(" ") else data)
+
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+def iter_content_deltas(lines):
+    """Yield the text content of each chat-completion chunk in an SSE stream."""
+    for data in iter_sse_data(lines):
+        if data == "[DONE]":
+            return
+
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+
+        if "error" in chunk:
+            error = chunk["error"]
+            message = error.get("message", error) if isinstance(error, dict) else error
+            raise StreamError(str(message))
+
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+
+def stream_chat_completion(url, headers, data, post=requests.post, **kwargs):
+    """Stream a chat completion, yielding text chunks as they arrive.
+
+    `post` can be any callable with the signature of `requests.post`, which
+    lets callers route the request through a pooled session.
+    """
+    payload = dict(data, stream=True)
+    response = post(url, headers=headers, json=payload, stream=True, **kwargs)
+    try:
+        if response.status_code != 200:
+            raise StreamError(f"{response.status_code} - {response.text}")
+        yield from iter_content_deltas(response.iter_lines())
+    finally:
+        response.close()
+
+
+class SentenceBuffer:
+    """Accumulate streamed text and release it one complete sentence at a time."""
+
+    def __init__(self, min_chars=20):
+        # Very short fragments ("Hi.", "1.") are merged with the next sentence so
+        # the TTS engine is not started for a single word.
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Add streamed text and return the sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left once the stream has finished."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder
+
+
+def split_sentences(text, min_chars=20):
+    """Split a complete response into sentences the same way streamed text is split."""
+    sentence_buffer = SentenceBuffer(min_chars=min_chars)
+    sentences = sentence_buffer.feed(text)
+    remainder = sentence_buffer.flush()
+    if remainder:
+        sentences.append(remainder)
+    return sentences
@@ -0,0 +1,297 @@
+"""
+Latency-aware routing across an ordered list of LLM models.
+Each model's recent time to first token and error rate are tracked, and
+models are tried in order of expected latency (with a bias towards the
+configured order). A request goes to the best model first; if it has not
+answered within that model's adaptive deadline (its recent p95), a hedged
+request goes to the next model, and the first good answer wins while the
+others are cancelled. Failures fall through to the next model at once.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .tracing import percentile
+
+# Threads for concurrent attempts of hedged requests, shared by every session
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("HEDGE_WORKERS", "32")),
+    thread_name_prefix="hedge"
+)
+
+
+class ModelError(Exception):
+    """A model answered with an error status."""
+
+
+class Attempt:
+    """One request to one model, with a cancel token.
+
+    `last` is False while other models remain to fall back on; such attempts
+    should fail fast instead of retrying.
+    """
+
+    def __init__(self, model, last=True):
+        self.model = model
+        self.last = last
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                # Closing an in-flight response may fail; the attempt is abandoned either way
+                pass
+
+    def on_cancel(self, callback):
+        """Run `callback` when the attempt is cancelled (immediately if it already was)."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class ModelStats:
+    """Rolling latencies (per request kind) and outcomes of one model."""
+
+    def __init__(self, window):
+        self.latencies = {}  # kind -> deque of seconds
+        self.outcomes = deque(maxlen=window)  # (time, True for errors)
+        self.window = window
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def add_latency(self, kind, seconds):
+        values = self.latencies.get(kind)
+        if values is None:
+            values = self.latencies[kind] = deque(maxlen=self.window)
+        values.append(seconds)
+
+    def error_rate(self, ttl):
+        """Share of errors among outcomes of the last `ttl` seconds."""
+        cutoff = time.monotonic() - ttl
+        recent = [error for at, error in self.outcomes if at >= cutoff]
+        return sum(recent) / len(recent) if recent else 0.0
+
+
+class ModelRouter:
+    """Ordered models with rolling latency and error tracking and adaptive hedge deadlines."""
+
+    def __init__(self, models, window=100, min_samples=5, default_deadline=3.0,
+                 min_deadline=0.3, max_deadline=10.0, hedge_percentile=95, preference=0.25, error_ttl=60.0):
+        if not models:
+            raise ValueError("At least one model is required")
+        self.models = list(models)
+        self.min_samples = min_samples
+        # Deadline before a model has enough samples, and bounds for the adaptive one
+        self.default_deadline = default_deadline
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.hedge_percentile = hedge_percentile
+        # Each later position in the configured list counts as this much slower
+        self.preference = preference
+        # Errors are forgotten after this long, so a demoted model is tried again
+        self.error_ttl = error_ttl
+        self._stats = {model: ModelStats(window) for model in self.models}
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.models[0]
+
+    def _latency(self, model, kind, q):
+        # Caller holds the lock
+        values = self._stats[model].latencies.get(kind)
+        if not values or len(values) < self.min_samples:
+            return None
+        return percentile(sorted(values), q)
+
+    def order(self, kind="stream"):
+        """Models by expected latency, penalizing errors and later configured positions."""
+        with self._lock:
+            def score(item):
+                index, model = item
+                typical = self._latency(model, kind, 50)
+                if typical is None:
+                    typical = self.default_deadline / 2
+                error_rate = self._stats[model].error_rate(self.error_ttl)
+                return typical * (1 + 4 * error_rate) * (1 + self.preference * index), index
+            return [model for _, model in sorted(enumerate(self.models), key=score)]
+
+    def deadline(self, model, kind="stream"):
+        """Seconds to wait for `model` before hedging: its recent p95, within bounds."""
+        with self._lock:
+            p95 = self._latency(model, kind, self.hedge_percentile)
+        if p95 is None:
+            return self.default_deadline
+        return min(self.max_deadline, max(self.min_deadline, p95))
+
+    def record(self, model, kind="stream", latency=None, error=False):
+        """Record an attempt: its latency to the first answer, or an error."""
+        with self._lock:
+            stats = self._stats[model]
+            stats.requests += 1
+            stats.outcomes.append((time.monotonic(), bool(error)))
+            if error:
+                stats.errors += 1
+            elif latency is not None:
+                stats.add_latency(kind, latency)
+
+    def _count(self, model, name):
+        with self._lock:
+            stats = self._stats[model]
+            setattr(stats, name, getattr(stats, name) + 1)
+
+    def stats(self):
+        """Per-model request counts, error rate, latency percentiles (ms) and current deadline."""
+        result = {}
+        for model in self.models:
+            with self._lock:
+                stats = self._stats[model]
+                entry = {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "error_rate": round(stats.error_rate(self.error_ttl), 3),
+                    "hedges": stats.hedges,
+                    "wins": stats.wins
+                }
+                for kind in sorted(stats.latencies):
+                    values = sorted(stats.latencies[kind])
+                    entry[f"{kind}_p50_ms"] = round(percentile(values, 50) * 1000, 1)
+                    entry[f"{kind}_p95_ms"] = round(percentile(values, 95) * 1000, 1)
+            entry["deadline_ms"] = round(self.deadline(model) * 1000, 1)
+            result[model] = entry
+        return result
+
+
+def hedged(router, run, kind="stream", discard=None, executor=None, admit=None):
+    """Run `run(attempt)` against the router's models until one succeeds.
+
+    `run` blocks until the model's first answer (the first token, or the
+    whole reply) and returns it, raising on failure; it should honour
+    `attempt.cancelled` and register cleanup with `attempt.on_cancel`.
+    A result that arrives after another attempt has won is passed to
+    `discard`. Returns (model, result, attempts started); raises the last
+    error when every model fails.
+
+    `admit(optional)` gates each attempt before its clock starts. For the
+    first attempt and for fall-throughs with nothing else in flight it may
+    block (or raise) and returns True; for hedges and other optional
+    attempts it must not wait, and returns False to skip the attempt.
+    """
+    models = router.order(kind)
+    if admit is not None:
+        admit(False)
+    if len(models) == 1:
+        # Nothing to hedge with; skip the thread hop
+        attempt = Attempt(models[0])
+        try:
+            result = run(attempt)
+        except Exception:
+            router.record(attempt.model, kind, error=True)
+            raise
+        router.record(attempt.model, kind, attempt.elapsed())
+        return attempt.model, result, 1
+
+    executor = executor or _executor
+    events = queue.Queue()
+    lock = threading.Lock()
+    state = {"winner": None}
+    attempts = []
+
+    def run_attempt(attempt):
+        try:
+            result = run(attempt)
+        except Exception as e:
+            events.put((attempt, None, e))
+            return
+        # Queue under the lock, so a result is either seen by the drain below or known to be late
+        with lock:
+            late = state["winner"] is not None
+            if not late:
+                events.put((attempt, result, None))
+        if late and discard:
+            discard(result)
+
+    def launch(index, hedge):
+        model = models[index]
+        attempt = Attempt(model, last=index == len(models) - 1)
+        attempts.append(attempt)
+        if hedge:
+            router._count(model, "hedges")
+        executor.submit(run_attempt, attempt)
+        return attempt
+
+    launch(0, False)
+    next_index = 1
+    hedging = True
+    errors = []
+    failed = set()
+    while True:
+        timeout = None
+        if hedging and next_index < len(models):
+            newest = attempts[-1]
+            timeout = max(0.0, router.deadline(newest.model, kind) - newest.elapsed())
+        try:
+            attempt, result, error = events.get(timeout=timeout)
+        except queue.Empty:
+            if admit is not None and not admit(True):
+                # No spare quota for a duplicate request; keep waiting on the ones in flight
+                hedging = False
+                continue
+            # The newest attempt is slower than usual; race the next model against it
+            launch(next_index, True)
+            next_index += 1
+            continue
+
+        if error is not None:
+            router.record(attempt.model, kind, error=True)
+            errors.append(error)
+            failed.add(attempt)
+            in_flight = len(errors) < len(attempts)
+            if next_index < len(models):
+                # While other attempts are running, fall through only on spare quota rather than queue
+                if admit is None or admit(in_flight):
+                    launch(next_index, False)
+                    next_index += 1
+            elif not in_flight:
+                raise errors[-1]
+            continue
+
+        with lock:
+            state["winner"] = attempt
+        router.record(attempt.model, kind, attempt.elapsed())
+        router._count(attempt.model, "wins")
+        for other in attempts:
+            if other is not attempt and other not in failed:
+                # The loser was at least this slow, which should count against it. Capped at its
+                # deadline so that hedging does not keep raising the deadline it is based on.
+                router.record(other.model, kind, min(other.elapsed(), router.deadline(other.model, kind)))
+                other.cancel()
+        # Results that were already queued lost the race
+        while True:
+            try:
+                _, leftover, leftover_error = events.get_nowait()
+            except queue.Empty:
+                break
+            if leftover_error is None and discard:
+                discard(leftover)
+        return attempt.model, result, len(attempts)
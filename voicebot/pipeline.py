@@ -0,0 +1,435 @@
+"""
+The STT -> intent -> LLM -> TTS pipeline, independent of any UI.
+One Pipeline owns the process-wide resources (HTTP pool, caches, outbox)
+and serves any number of conversations, each described by a SessionState.
+Heavy objects are built once; the email subsystem is only imported and
+started when a session first needs it.
+"""
+import os
+import threading
+
+import requests
+import speech_recognition as sr
+
+from . import config
+from .http_client import OpenRouterClient
+from .intent_router import EMAIL_TRIGGERS, IntentRouter, extract_email_slots
+from .lang_detect import detect_language
+from .conversation_context import estimate_tokens
+from .coalescing import Coalescer
+from .llm_stream import StreamError, stream_chat_completion
+from .model_router import ModelError, ModelRouter, hedged
+from .preprocess import preprocess
+from .request_scheduler import RateLimited, RequestScheduler
+from .response_cache import ResponseCache, make_cache_key
+from .tracing import NULL_SPAN, NULL_TURN, Tracer
+from .transcription import transcribe
+from .tts_cache import AudioSegmentCache, synthesize_segment
+from .tts_pipeline import iter_synthesized, split_segments
+
+MISSING_KEY_MESSAGE = "Error: OpenRouter API key not found. Please check your .env file."
+
+
+class ResponseStream:
+    """Iterable of response chunks for one turn.
+
+    After iteration `text` holds the full reply, `lang` the language it was
+    requested in and `source` where it came from: "local", "cache", "llm" or "error".
+    """
+
+    def __init__(self, chunks, lang, source, on_complete=None, span=NULL_SPAN):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self._span = span
+        self.lang = lang
+        self.source = source
+        self.text = ""
+        self.error = None
+
+    def __iter__(self):
+        chunk_count = 0
+        try:
+            for chunk in self._chunks:
+                if not chunk_count:
+                    self._span.mark("first_token_ms")
+                chunk_count += 1
+                self.text += chunk
+                yield chunk
+        except (StreamError, RateLimited, requests.RequestException) as e:
+            self.error = e
+            message = f"Error: {e}"
+            # Keep a partial answer and put the error below it
+            chunk = f"\n\n{message}" if self.text else message
+            self.text += chunk
+            yield chunk
+            return
+        finally:
+            # Token estimates are only worth computing when tracing
+            if self._span is not NULL_SPAN:
+                if self.error is not None:
+                    self._span.set(error=str(self.error))
+                self._span.end(chunks=chunk_count, response_chars=len(self.text), output_tokens=estimate_tokens(self.text))
+        if self._on_complete:
+            self._on_complete(self.text)
+
+
+class Pipeline:
+    """Shared resources plus the per-turn operations that use them."""
+
+    def __init__(self, client=None, response_cache=None, tts_cache=None,
+                 gmail_client=None, outbox=None, recognizer_factory=sr.Recognizer, tracer=None,
+                 synthesizer=synthesize_segment, models=None, limiter=None, coalescer=None):
+        self.client = client or OpenRouterClient(
+            config.OPENROUTER_BASE_URL,
+            api_key=os.environ.get("OPENROUTER_API_KEY", ""),
+            connect_timeout=config.OPENROUTER_CONNECT_TIMEOUT,
+            read_timeout=config.OPENROUTER_READ_TIMEOUT,
+            max_retries=config.OPENROUTER_MAX_RETRIES
+        )
+        # Ordered models with latency tracking; requests are hedged across them
+        self.models = models or ModelRouter(
+            config.OPENROUTER_MODELS,
+            default_deadline=config.HEDGE_DEADLINE,
+            max_deadline=config.HEDGE_MAX_DEADLINE
+        )
+        # One quota for the shared API key, queued fairly across sessions
+        self.limiter = limiter or RequestScheduler(
+            rate_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+            burst=config.LLM_BURST,
+            max_queue=config.LLM_MAX_QUEUE,
+            max_wait=config.LLM_MAX_WAIT
+        )
+        # Identical concurrent requests share one upstream call
+        self.coalescer = coalescer or Coalescer()
+        self.response_cache = response_cache or ResponseCache(
+            db_path=os.path.join(config.CACHE_DIR, "responses.sqlite3"),
+            ttl=config.RESPONSE_CACHE_TTL
+        )
+        self.tts_cache = tts_cache or AudioSegmentCache(
+            os.path.join(config.CACHE_DIR, "tts"),
+            max_bytes=int(config.TTS_CACHE_MAX_MB * 1024 * 1024)
+        )
+        self.recognizer_factory = recognizer_factory
+        # synthesizer(text, lang) -> MP3 bytes; gTTS unless replaced (e.g. by a benchmark fake)
+        self.synthesizer = synthesizer
+        self.tracer = tracer or Tracer(config.TRACING, config.TRACE_PATH or None)
+        self._recognizer = None
+        # Gmail is only touched once an email is actually queued or listed
+        self._gmail_client = gmail_client
+        self._outbox = outbox
+        self._outbox_path = os.path.join(config.CACHE_DIR, "outbox.sqlite3")
+        self._lock = threading.RLock()
+        self.router = IntentRouter()
+        self.router.register("send_email", EMAIL_TRIGGERS, self.handle_email_request, extract_email_slots)
+
+    @property
+    def recognizer(self):
+        """The shared speech recognizer (it only holds settings, so sessions can share it)."""
+        if self._recognizer is None:
+            self._recognizer = self.recognizer_factory()
+        return self._recognizer
+
+    @property
+    def gmail_client(self):
+        with self._lock:
+            if self._gmail_client is None:
+                from .gmail_client import GmailClient
+                self._gmail_client = GmailClient()
+            return self._gmail_client
+
+    @property
+    def outbox(self):
+        """The durable email outbox (its delivery worker starts on first use)."""
+        with self._lock:
+            if self._outbox is None:
+                from .email_outbox import EmailOutbox
+                self._outbox = EmailOutbox(self.gmail_client.send_batch, db_path=self._outbox_path)
+            return self._outbox
+
+    def outbox_statuses(self, session_id):
+        """Delivery status of a session's emails, without starting the outbox if it was never used."""
+        if self._outbox is None and not os.path.exists(self._outbox_path):
+            return []
+        return self.outbox.statuses(session_id)
+
+    def resolve_language(self, session, text, turn=NULL_TURN):
+        """Return the language to use for a text: the session's choice, or detected in auto mode."""
+        if session.language == "auto":
+            with turn.span("detect_language", chars=len(text)) as span:
+                lang = detect_language(text)
+                span.set(language=lang)
+            return lang
+        return session.language
+
+    def preprocess(self, recording, sample_rate, turn=NULL_TURN):
+        """Turn a float32 recording into trimmed, normalized AudioData for transcribe().
+
+        Returns the audio and a report of the bytes saved on upload.
+        """
+        with turn.span("preprocess") as span:
+            audio_data, report = preprocess(
+                recording, sample_rate, trim=config.TRIM_SILENCE, flac=config.PREENCODE_FLAC
+            )
+            span.set(**report)
+        return audio_data, report
+
+    def transcribe(self, session, audio_data, turn=NULL_TURN):
+        """Transcribe in-memory audio (sr.AudioData); returns the text and its language (or None)."""
+        with turn.span("transcribe", audio_bytes=len(audio_data.frame_data)) as span:
+            try:
+                if not audio_data.frame_data:
+                    # Nothing but silence survived preprocessing; skip the round trip
+                    raise sr.UnknownValueError()
+                # In auto mode English and Bengali are recognized in parallel
+                text, lang = transcribe(self.recognizer, audio_data, session.language)
+                span.set(language=lang, chars=len(text))
+                return text, lang
+            except sr.UnknownValueError:
+                span.set(error="unknown_value")
+                return "Sorry, I couldn't understand the audio.", None
+            except sr.RequestError as e:
+                span.set(error=str(e))
+                return f"Speech recognition service error: {e}", None
+            except Exception as e:
+                span.set(error=str(e))
+                return f"Error during transcription: {str(e)}", None
+
+    def handle_email_request(self, text, slots, session):
+        """Process a request to send an email."""
+        if "error" in slots:
+            return slots["error"]
+
+        # Queue the email; the outbox worker delivers it in the background
+        session_id = session.session_id if session else "default"
+        self.outbox.enqueue(session_id, slots["recipient"], slots["subject"], slots["body"])
+
+        return f"Your email to {slots['recipient']} has been queued and will be sent shortly."
+
+    def build_chat_request(self, session, prompt, lang=None):
+        """Build the OpenRouter payload and response language for a prompt."""
+        # The language is normally resolved once per turn by the caller
+        detected_lang = lang or self.resolve_language(session, prompt)
+
+        # For Bengali, add instruction to respond in Bengali
+        system_message = None
+        if detected_lang == "bn":
+            system_message = config.BENGALI_SYSTEM_MESSAGE
+
+        # Earlier turns (the current prompt may already be the last message in history)
+        history = session.messages
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == prompt:
+            history = history[:-1]
+
+        # Recent turns fit into the token budget; older ones are summarized
+        messages = session.context_window.build(history, prompt, system_message)
+
+        # The preferred model; the one that answers is chosen per request
+        data = {
+            "model": self.models.primary,
+            "messages": messages,
+            "max_tokens": config.MAX_TOKENS
+        }
+
+        return data, detected_lang
+
+    def response_cache_key(self, prompt, data, lang):
+        """Cache key for a chat request: normalized prompt, language, model, system message and context."""
+        system_message = config.BENGALI_SYSTEM_MESSAGE if lang == "bn" else ""
+        # Everything sent before the prompt (summary and earlier turns) is part of the key
+        context = data["messages"][:-1]
+        return make_cache_key(prompt, lang, data["model"], system_message, context)
+
+    def route_intent(self, session, prompt, turn=NULL_TURN):
+        """Answer local commands (e.g. sending email) without the LLM; returns None for other prompts."""
+        with turn.span("intent") as span:
+            local_reply = self.router.route(prompt, session)
+            span.set(local=local_reply is not None)
+        return local_reply
+
+    def cached_response(self, session, prompt, data, lang, turn=NULL_TURN):
+        """Look a request up in the response cache; returns (cache key or None, cached reply or None)."""
+        if not session.use_response_cache:
+            return None, None
+        with turn.span("response_cache") as span:
+            cache_key = self.response_cache_key(prompt, data, lang)
+            cached = self.response_cache.get(cache_key)
+            span.set(hit=cached is not None, response_chars=len(cached) if cached else 0)
+        return cache_key, cached
+
+    def llm_span(self, data, turn, stream):
+        """Start the span of an LLM call, recording the request size."""
+        if turn is NULL_TURN:
+            return NULL_SPAN
+        return turn.span(
+            "llm",
+            stream=stream,
+            model=data["model"],
+            messages=len(data["messages"]),
+            prompt_chars=sum(len(message["content"]) for message in data["messages"])
+        )
+
+    def stream_response(self, session, prompt, lang=None, turn=NULL_TURN):
+        """Return a ResponseStream for a prompt; complete answers are cached when it is exhausted."""
+        lang = lang or self.resolve_language(session, prompt, turn)
+
+        # Local commands (e.g. sending email) never reach the LLM
+        local_reply = self.route_intent(session, prompt, turn)
+        if local_reply is not None:
+            return ResponseStream([local_reply], lang, "local")
+
+        if not self.client.api_key:
+            return ResponseStream([MISSING_KEY_MESSAGE], lang, "error")
+
+        data, lang = self.build_chat_request(session, prompt, lang)
+
+        # Repeated prompts are answered from the cache without a round trip
+        cache_key, cached = self.cached_response(session, prompt, data, lang, turn)
+        if cached is not None:
+            return ResponseStream([cached], lang, "cache")
+
+        on_complete = None
+        if cache_key:
+            def on_complete(text):
+                if text:
+                    self.response_cache.set(cache_key, text)
+
+        span = self.llm_span(data, turn, stream=True)
+        if cache_key:
+            # Sessions that share cached answers also share identical in-flight requests
+            chunks, shared = self.coalescer.stream(
+                cache_key, lambda: self.stream_chat(data, session.session_id, span)
+            )
+            span.set(coalesced=shared)
+        else:
+            chunks = self.stream_chat(data, session.session_id, span)
+        return ResponseStream(chunks, lang, "llm", on_complete, span)
+
+    def stream_chat(self, data, session_id="default", span=NULL_SPAN):
+        """Yield reply chunks from whichever model starts answering first.
+
+        The request waits for the shared request quota, goes to the best model
+        and is hedged on the next one if no token arrives within the first
+        model's deadline and a quota token is spare (see model_router).
+        """
+        url = self.client.url("/chat/completions")
+
+        def start(attempt):
+            def post(url, **kwargs):
+                # Rate limits, server and connection errors fall through to the next model instead of being retried
+                response = self.client.post(url, cancel=attempt.cancelled, retry=attempt.last, **kwargs)
+                # A losing stream is closed as soon as its response headers are in
+                attempt.on_cancel(response.close)
+                return response
+
+            chunks = stream_chat_completion(url, None, dict(data, model=attempt.model), post=post)
+            return next(chunks, None), chunks
+
+        model, (first, chunks), attempts = hedged(
+            self.models, start, "stream", discard=lambda result: result[1].close(),
+            admit=self.admission(session_id, span)
+        )
+        span.set(model=model, attempts=attempts)
+        if first is not None:
+            yield first
+        yield from chunks
+
+    def admission(self, session_id, span=NULL_SPAN):
+        """Quota gate for hedged(): required attempts queue for a token, optional ones (hedges) only take a spare one.
+
+        Waiting happens before an attempt's clock starts, so it does not count as model latency.
+        """
+        waited = [0.0]
+
+        def admit(optional):
+            if optional:
+                return self.limiter.try_acquire()
+            waited[0] += self.limiter.acquire(session_id)
+            span.set(queue_wait_ms=round(waited[0] * 1000, 2))
+            return True
+        return admit
+
+    def get_response(self, session, prompt, lang=None, turn=NULL_TURN):
+        """Get the complete reply for a prompt; returns the text and its language."""
+        lang = lang or self.resolve_language(session, prompt, turn)
+
+        local_reply = self.route_intent(session, prompt, turn)
+        if local_reply is not None:
+            return local_reply, lang
+
+        if not self.client.api_key:
+            return MISSING_KEY_MESSAGE, lang
+
+        data, lang = self.build_chat_request(session, prompt, lang)
+
+        cache_key, cached = self.cached_response(session, prompt, data, lang, turn)
+        if cached is not None:
+            return cached, lang
+
+        url = self.client.url("/chat/completions")
+
+        def start(attempt):
+            response = self.client.post(
+                url, json=dict(data, model=attempt.model), cancel=attempt.cancelled, retry=attempt.last
+            )
+            if response.status_code != 200:
+                raise ModelError(f"{response.status_code} - {response.text}")
+            return response
+
+        def request():
+            return hedged(self.models, start, "complete", admit=self.admission(session.session_id, span))
+
+        with self.llm_span(data, turn, stream=False) as span:
+            try:
+                if cache_key:
+                    (model, response, attempts), shared = self.coalescer.call(cache_key, request)
+                    span.set(coalesced=shared)
+                else:
+                    model, response, attempts = request()
+            except (requests.RequestException, ModelError, RateLimited) as e:
+                span.set(error=str(e))
+                return f"Error: {e}", lang
+
+            span.set(model=model, attempts=attempts, status=response.status_code, response_bytes=len(response.content))
+
+            body = response.json()
+            bot_response = body["choices"][0]["message"]["content"]
+            usage = body.get("usage") or {}
+            span.set(
+                response_chars=len(bot_response),
+                input_tokens=usage.get("prompt_tokens"),
+                output_tokens=usage.get("completion_tokens")
+            )
+
+        if cache_key:
+            self.response_cache.set(cache_key, bot_response)
+        return bot_response, lang
+
+    def text_turn(self, session, text, lang=None, turn=None):
+        """Run one complete text turn and record it in the session's history."""
+        if turn is None:
+            turn = self.tracer.start_turn(session.session_id, kind="text")
+        try:
+            with session.lock:
+                lang = lang or self.resolve_language(session, text, turn)
+                session.add_message("user", text)
+                reply, lang = self.get_response(session, text, lang, turn)
+                session.add_message("assistant", reply)
+            turn.set(language=lang)
+        finally:
+            turn.release()
+        return reply, lang
+
+    def synthesize_segment(self, segment, lang, turn=NULL_TURN):
+        """Return MP3 bytes for one short segment (served from the audio cache when possible)."""
+        with turn.span("tts_synthesis", chars=len(segment), language=lang) as span:
+            data = self.tts_cache.get(segment, lang)
+            span.set(cache_hit=data is not None)
+            if data is None:
+                data = self.synthesizer(segment, lang)
+                self.tts_cache.put(segment, lang, data)
+            span.set(audio_bytes=len(data))
+        return data
+
+    def synthesize(self, text, lang, turn=NULL_TURN):
+        """Yield MP3 segments for a text in order, synthesizing ahead of the consumer."""
+        return iter_synthesized(split_segments(text), lambda segment: self.synthesize_segment(segment, lang, turn))
@@ -0,0 +1,117 @@
+"""
+Audio clean-up between capture and speech recognition.
+Removes the DC offset, trims leading and trailing silence with vectorized
+frame energies, normalizes the level, and optionally encodes the clip to
+FLAC once in-process. The recognizer uploads FLAC; without a pre-encoded
+clip speech_recognition runs the flac executable for every request (twice
+per turn in auto mode).
+"""
+import io
+
+import numpy as np
+import speech_recognition as sr
+
+from .audio_utils import to_pcm16
+from .vad import frame_features, frame_signal
+
+
+def remove_dc(samples):
+    """Subtract the mean so a microphone's DC offset does not count as signal."""
+    if not len(samples):
+        return samples
+    return samples - np.mean(samples, dtype=np.float64).astype(np.float32)
+
+
+def trim_silence(samples, sample_rate, frame_ms=20, threshold_db=-35.0, min_rms=1e-4, pad_ms=150):
+    """Drop leading and trailing frames quieter than `threshold_db` below the loudest frame.
+
+    `pad_ms` of audio is kept on each side so word onsets and endings are not
+    clipped. Returns an empty array when nothing rises above `min_rms`.
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    frames = frame_signal(samples, frame_length)
+    if not len(frames):
+        return samples
+
+    rms, _ = frame_features(frames)
+    threshold = max(min_rms, float(np.max(rms)) * 10 ** (threshold_db / 20))
+    voiced = np.flatnonzero(rms > threshold)
+    if not len(voiced):
+        return samples[:0]
+
+    pad = int(sample_rate * pad_ms / 1000)
+    start = max(0, voiced[0] * frame_length - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + pad)
+    return samples[start:end]
+
+
+def normalize(samples, target_rms=0.1, peak=0.95, max_gain=10.0):
+    """Scale towards `target_rms` without letting the peak exceed `peak` or the gain exceed `max_gain`."""
+    if not len(samples):
+        return samples
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    max_abs = float(np.max(np.abs(samples)))
+    if rms == 0.0 or max_abs == 0.0:
+        return samples
+    gain = min(target_rms / rms, peak / max_abs, max_gain)
+    return (samples * gain).astype(np.float32)
+
+
+def encode_flac(pcm, sample_rate):
+    """Encode 16-bit mono PCM bytes to FLAC with libsndfile, or return None if soundfile is unavailable."""
+    try:
+        import soundfile as sf
+    except (ImportError, OSError):
+        return None
+    buffer = io.BytesIO()
+    try:
+        sf.write(buffer, np.frombuffer(pcm, dtype="<i2"), sample_rate, format="FLAC", subtype="PCM_16")
+    except RuntimeError:
+        # libsndfile built without FLAC support
+        return None
+    return buffer.getvalue()
+
+
+class PreprocessedAudio(sr.AudioData):
+    """AudioData that hands out a FLAC encoding made once, instead of running the flac executable per request."""
+
+    def __init__(self, frame_data, sample_rate, flac_data=None):
+        super().__init__(frame_data, sample_rate, 2)
+        self.flac_data = flac_data
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        unchanged = convert_rate in (None, self.sample_rate) and convert_width in (None, 2)
+        if self.flac_data is not None and unchanged:
+            return self.flac_data
+        return super().get_flac_data(convert_rate, convert_width)
+
+
+def preprocess(recording, sample_rate, trim=True, flac=True):
+    """Clean up a float32 recording for recognition.
+
+    Returns (PreprocessedAudio, report), where the report compares the bytes
+    the untrimmed clip would have uploaded with what is uploaded now.
+    """
+    samples = np.asarray(recording, dtype=np.float32).reshape(-1)
+    # The recognizer uploads FLAC either way, so the untrimmed clip's FLAC is the baseline
+    raw_pcm = to_pcm16(samples)
+    raw_flac = encode_flac(raw_pcm, sample_rate) if flac and len(raw_pcm) else None
+    raw_bytes = len(raw_flac) if raw_flac is not None else len(raw_pcm) + 44
+
+    samples = remove_dc(samples)
+    if trim:
+        samples = trim_silence(samples, sample_rate)
+    samples = normalize(samples)
+
+    pcm = to_pcm16(samples)
+    flac_data = encode_flac(pcm, sample_rate) if flac and len(pcm) else None
+    upload_bytes = len(flac_data) if flac_data is not None else len(pcm) + 44
+    report = {
+        "input_seconds": round(len(recording) / sample_rate, 2),
+        "output_seconds": round(len(samples) / sample_rate, 2),
+        "input_bytes": raw_bytes,
+        "upload_bytes": upload_bytes,
+        "bytes_saved": raw_bytes - upload_bytes,
+        "flac": flac_data is not None
+    }
+    return PreprocessedAudio(pcm, sample_rate, flac_data), report
@@ -0,0 +1,168 @@
+"""
+Process-wide admission control for OpenRouter requests.
+Every session shares one API key, so requests draw from one token bucket
+sized to the key's quota. When the bucket is empty, waiting requests are
+served round-robin across sessions, so one busy session cannot starve the
+others, and requests beyond the queue limit or wait limit are refused.
+"""
+import threading
+import time
+from collections import deque
+
+from .http_client import RequestCancelled
+from .tracing import percentile
+
+
+class RateLimited(Exception):
+    """Raised when a request cannot get a quota token in time (or the queue is full)."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    Not thread-safe on its own; RequestScheduler calls it under its lock.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """Token bucket with fair (round-robin per session) queuing and wait metrics."""
+
+    def __init__(self, rate_per_minute=20, burst=10, max_queue=100, max_wait=30.0, window=500):
+        # A rate of 0 disables limiting
+        self.rate_per_minute = rate_per_minute
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst) if rate_per_minute > 0 else None
+        self._queues = {}    # session_id -> deque of waiting tickets
+        self._ring = deque()  # sessions with waiting tickets; the head is served next
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=window)
+        self._counters = {"granted": 0, "rejected": 0, "timeouts": 0, "cancelled": 0, "declined": 0,
+                          "max_queue_depth": 0}
+
+    def acquire(self, session_id, cancel=None, timeout=None):
+        """Block until the session may send one request; returns the seconds waited.
+
+        Raises RateLimited when the queue is full or the wait exceeds `timeout`
+        (max_wait by default), and RequestCancelled if `cancel` is set meanwhile.
+        """
+        if self._bucket is None:
+            return 0.0
+        timeout = self.max_wait if timeout is None else timeout
+        started = time.monotonic()
+        ticket = object()
+
+        with self._cond:
+            if self._depth >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise RateLimited("Too many requests are waiting; please try again shortly.")
+            session_queue = self._queues.get(session_id)
+            if session_queue is None:
+                session_queue = self._queues[session_id] = deque()
+                self._ring.append(session_id)
+            session_queue.append(ticket)
+            self._depth += 1
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], self._depth)
+
+            try:
+                while True:
+                    delay = None
+                    if self._queues[self._ring[0]][0] is ticket:
+                        delay = self._bucket.wait_time()
+                        if delay == 0:
+                            self._bucket.take()
+                            self._grant(session_id)
+                            waited = time.monotonic() - started
+                            self._waits.append(waited)
+                            self._counters["granted"] += 1
+                            return waited
+
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise RateLimited(f"Waited {timeout:g}s for the request quota; please try again shortly.")
+                    if cancel is not None and cancel.is_set():
+                        self._counters["cancelled"] += 1
+                        raise RequestCancelled("Request cancelled while queued")
+
+                    # Woken early when the queue changes; cancellation is polled
+                    limits = [remaining] + ([delay] if delay else []) + ([0.1] if cancel is not None else [])
+                    self._cond.wait(min(limits))
+            except BaseException:
+                self._withdraw(session_id, ticket)
+                raise
+
+    def try_acquire(self):
+        """Take a token only if one is free and nobody is queued; never waits (for optional requests such as hedges)."""
+        if self._bucket is None:
+            return True
+        with self._cond:
+            if self._depth == 0 and self._bucket.wait_time() == 0:
+                self._bucket.take()
+                self._counters["granted"] += 1
+                return True
+            self._counters["declined"] += 1
+            return False
+
+    def _grant(self, session_id):
+        # Caller holds the lock; the ticket at the head of the head session is served
+        session_queue = self._queues[session_id]
+        session_queue.popleft()
+        self._ring.popleft()
+        if session_queue:
+            self._ring.append(session_id)
+        else:
+            del self._queues[session_id]
+        self._depth -= 1
+        self._cond.notify_all()
+
+    def _withdraw(self, session_id, ticket):
+        # Caller holds the lock
+        session_queue = self._queues.get(session_id)
+        if session_queue is None or ticket not in session_queue:
+            return
+        session_queue.remove(ticket)
+        if not session_queue:
+            del self._queues[session_id]
+            self._ring.remove(session_id)
+        self._depth -= 1
+        self._cond.notify_all()
+
+    def stats(self):
+        """Queue depth, waiting sessions, wait-time percentiles (ms) and counters."""
+        with self._cond:
+            waits = sorted(self._waits)
+            stats = dict(self._counters)
+            stats.update(
+                rate_per_minute=self.rate_per_minute,
+                queue_depth=self._depth,
+                waiting_sessions=len(self._queues),
+                tokens=round(self._bucket.tokens, 2) if self._bucket else None
+            )
+        for q in (50, 95, 99):
+            value = percentile(waits, q)
+            stats[f"wait_p{q}_ms"] = round(value * 1000, 1) if value is not None else None
+        return stats
@@ -0,0 +1,136 @@
+"""
+Two-tier cache for LLM responses.
+Tier 1 is an in-memory LRU with a TTL, private to the process.
+Tier 2 is a SQLite database on disk, shared across sessions and restarts.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(text):
+    """Normalize a prompt so trivially different phrasings share a cache entry."""
+    text = text.casefold().strip()
+    text = re.sub(r'\s+', ' ', text)
+    # Trailing punctuation does not change the question ("hi!" == "hi")
+    return text.rstrip(' .!?।')
+
+
+def make_cache_key(prompt, language, model, system_message="", context=None):
+    """Build a stable cache key from the normalized prompt and request settings.
+
+    `context` holds any earlier turns sent with the prompt, since they change the answer.
+    """
+    material = json.dumps(
+        [normalize_prompt(prompt), language, model, system_message or "", context or []],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of a size-bounded SQLite store, both with a TTL."""
+
+    def __init__(self, db_path="cache/responses.sqlite3", memory_entries=256,
+                 disk_entries=5000, ttl=7 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+
+        self._memory = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                       "memory_evictions": 0, "disk_evictions": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        # WAL lets several Streamlit processes read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._db.commit()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT value, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self._stats["misses"] += 1
+                return None
+
+            value, stored_at = row
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            # Promote to the memory tier
+            self._remember(key, value, stored_at)
+            self._stats["disk_hits"] += 1
+            return value
+
+    def set(self, key, value):
+        """Store a response in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Evict the least recently used rows once the table is over its limit
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_entries,)
+            )
+            self._stats["disk_evictions"] += max(cursor.rowcount, 0)
+            self._db.commit()
+            self._stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the size of each tier."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _remember(self, key, value, stored_at):
+        # Caller holds the lock
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
@@ -0,0 +1,260 @@
+"""
+Asyncio HTTP/WebSocket front end for the voice pipeline.
+
+REST:
+    POST /sessions                      {"language": "auto"}  -> {"session_id": ...}
+    POST /sessions/{id}/turns           {"text": ..., "language": optional}
+    GET  /sessions/{id}/messages
+    GET  /stats/latency                 rolling p50/p95/p99 per pipeline stage
+    GET  /stats/models                  per-model latency, error rate and hedge deadline
+    GET  /stats/queue                   request quota queue depth, wait times and coalescing
+
+WebSocket /sessions/{id}/stream (JSON text frames plus binary audio):
+    client -> {"type": "text", "text": ...}
+              {"type": "audio_start", "sample_rate": 16000}, PCM16 mono frames, {"type": "audio_end"}
+    server -> {"type": "transcript"|"delta"|"reply"|"audio_end"|"error", ...}, MP3 segment frames
+
+Run with: python -m voicebot.server --host 0.0.0.0 --port 8080
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import WSMsgType, web
+
+from . import config
+from .audio_utils import from_pcm16
+from .llm_stream import SentenceBuffer
+from .pipeline import Pipeline
+from .session import SessionStore
+from .transcription import RECOGNITION_LANGUAGES
+
+# Threads for blocking pipeline work (HTTP, recognition, synthesis) across all sessions
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "32"))
+
+PIPELINE_KEY = web.AppKey("pipeline", Pipeline)
+SESSIONS_KEY = web.AppKey("sessions", SessionStore)
+
+
+def get_session(request):
+    session = request.app[SESSIONS_KEY].get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(reason="Unknown session")
+    return session
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Body must be a JSON object")
+    return body
+
+
+def check_language(language, allowed):
+    """Return `language` if it is None or one of `allowed`, else reject the request."""
+    if language is not None and language not in allowed:
+        raise web.HTTPBadRequest(reason=f"Unsupported language: {language} (use {', '.join(allowed)})")
+    return language
+
+
+async def create_session(request):
+    body = await read_json(request) if request.can_read_body else {}
+    session = request.app[SESSIONS_KEY].create(
+        language=check_language(body.get("language", "auto"), ["auto", *RECOGNITION_LANGUAGES]),
+        use_response_cache=body.get("use_response_cache", True)
+    )
+    return web.json_response({"session_id": session.session_id, "language": session.language}, status=201)
+
+
+async def post_turn(request):
+    session = get_session(request)
+    body = await read_json(request)
+    text = body.get("text")
+    text = text.strip() if isinstance(text, str) else ""
+    if not text:
+        raise web.HTTPBadRequest(reason="Missing text")
+    lang = check_language(body.get("language"), list(RECOGNITION_LANGUAGES))
+
+    pipeline = request.app[PIPELINE_KEY]
+    reply, lang = await asyncio.to_thread(pipeline.text_turn, session, text, lang)
+    return web.json_response({"reply": reply, "language": lang})
+
+
+async def get_messages(request):
+    session = get_session(request)
+    return web.json_response({"messages": session.messages})
+
+
+async def get_latency(request):
+    return web.json_response(request.app[PIPELINE_KEY].tracer.percentiles())
+
+
+async def get_model_stats(request):
+    return web.json_response(request.app[PIPELINE_KEY].models.stats())
+
+
+async def get_queue_stats(request):
+    pipeline = request.app[PIPELINE_KEY]
+    return web.json_response({**pipeline.limiter.stats(), "coalescing": pipeline.coalescer.stats()})
+
+
+async def stream_turn(ws, pipeline, session, text, lang=None, turn=None):
+    """Stream one turn over a WebSocket: text deltas first, MP3 segments per sentence as they complete."""
+    if turn is None:
+        turn = pipeline.tracer.start_turn(session.session_id, kind="text", transport="websocket")
+    try:
+        await stream_reply(ws, pipeline, session, text, lang, turn)
+    finally:
+        turn.release()
+
+
+async def stream_reply(ws, pipeline, session, text, lang, turn):
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def produce():
+        # Runs on a worker thread; turns of one session never overlap
+        with session.lock:
+            session.add_message("user", text)
+            stream = pipeline.stream_response(session, text, lang, turn)
+            loop.call_soon_threadsafe(events.put_nowait, ("lang", stream.lang))
+            for chunk in stream:
+                loop.call_soon_threadsafe(events.put_nowait, ("delta", chunk))
+            session.add_message("assistant", stream.text)
+        return stream.text
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    producer.add_done_callback(lambda _: events.put_nowait(("done", None)))
+
+    sentences = asyncio.Queue()
+
+    async def speak():
+        # Synthesis of sentence N overlaps generation of sentence N+1
+        while True:
+            sentence, sentence_lang = await sentences.get()
+            if sentence is None:
+                return
+            segments = await asyncio.to_thread(lambda: list(pipeline.synthesize(sentence, sentence_lang, turn)))
+            for segment in segments:
+                await ws.send_bytes(segment)
+
+    speaker = asyncio.ensure_future(speak())
+    sentence_buffer = SentenceBuffer()
+    stream_lang = lang
+    try:
+        while True:
+            kind, value = await events.get()
+            if kind == "done":
+                break
+            if kind == "lang":
+                stream_lang = value
+                continue
+            await ws.send_json({"type": "delta", "text": value})
+            for sentence in sentence_buffer.feed(value):
+                sentences.put_nowait((sentence, stream_lang))
+
+        reply = await producer
+        remainder = sentence_buffer.flush()
+        if remainder:
+            sentences.put_nowait((remainder, stream_lang))
+        await ws.send_json({"type": "reply", "text": reply, "language": stream_lang})
+    finally:
+        sentences.put_nowait((None, None))
+        await speaker
+    await ws.send_json({"type": "audio_end"})
+
+
+async def stream_session(request):
+    session = get_session(request)
+    pipeline = request.app[PIPELINE_KEY]
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+
+    # Audio between audio_start and audio_end is buffered here
+    state = {"pcm": None, "sample_rate": config.SAMPLE_RATE}
+    async for msg in ws:
+        if msg.type == WSMsgType.BINARY:
+            if state["pcm"] is not None:
+                state["pcm"].extend(msg.data)
+            continue
+        if msg.type != WSMsgType.TEXT:
+            continue
+
+        try:
+            event = msg.json()
+        except ValueError:
+            event = None
+        if not isinstance(event, dict):
+            await ws.send_json({"type": "error", "message": "Messages must be JSON objects"})
+            continue
+
+        try:
+            await handle_event(ws, pipeline, session, event, state)
+        except Exception as e:
+            await ws.send_json({"type": "error", "message": str(e)})
+
+    return ws
+
+
+async def handle_event(ws, pipeline, session, event, state):
+    """Handle one JSON control message of the stream protocol."""
+    kind = event.get("type")
+    if kind == "text":
+        if event.get("language") not in (None, *RECOGNITION_LANGUAGES):
+            await ws.send_json({"type": "error", "message": f"Unsupported language: {event['language']}"})
+            return
+        await stream_turn(ws, pipeline, session, event.get("text", ""), event.get("language"))
+    elif kind == "audio_start":
+        state["pcm"] = bytearray()
+        state["sample_rate"] = int(event.get("sample_rate", config.SAMPLE_RATE))
+    elif kind == "audio_end":
+        pcm, state["pcm"] = state["pcm"], None
+        if not pcm:
+            await ws.send_json({"type": "error", "message": "No audio received"})
+            return
+        turn = pipeline.tracer.start_turn(session.session_id, kind="voice", transport="websocket")
+        audio_data, report = await asyncio.to_thread(pipeline.preprocess, from_pcm16(pcm), state["sample_rate"], turn)
+        text, lang = await asyncio.to_thread(pipeline.transcribe, session, audio_data, turn)
+        await ws.send_json({"type": "transcript", "text": text, "language": lang, "bytes_saved": report["bytes_saved"]})
+        await stream_turn(ws, pipeline, session, text, lang, turn)
+    else:
+        await ws.send_json({"type": "error", "message": f"Unknown event type: {kind}"})
+
+
+async def on_startup(app):
+    # asyncio.to_thread uses the default executor; size it for many concurrent turns
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=SERVER_WORKERS, thread_name_prefix="pipeline")
+    )
+
+
+def create_app(pipeline=None, sessions=None):
+    """Build the aiohttp application (a Pipeline is created if none is given)."""
+    app = web.Application()
+    app[PIPELINE_KEY] = pipeline or Pipeline()
+    app[SESSIONS_KEY] = sessions or SessionStore()
+    app.on_startup.append(on_startup)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/turns", post_turn)
+    app.router.add_get("/sessions/{session_id}/messages", get_messages)
+    app.router.add_get("/sessions/{session_id}/stream", stream_session)
+    app.router.add_get("/stats/latency", get_latency)
+    app.router.add_get("/stats/models", get_model_stats)
+    app.router.add_get("/stats/queue", get_queue_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice chatbot HTTP/WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-conversation state, independent of any UI framework.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from . import config
+from .conversation_context import ContextWindow
+
+
+class SessionState:
+    """Everything the pipeline needs to know about one conversation."""
+
+    def __init__(self, session_id=None, language="auto", use_response_cache=True,
+                 context_budget=config.CONTEXT_TOKEN_BUDGET):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.language = language  # Options: "auto", "en", "bn"
+        self.use_response_cache = use_response_cache
+        self.messages = []
+        self.context_window = ContextWindow(budget_tokens=context_budget)
+        # Turns of one conversation are processed one at a time
+        self.lock = threading.Lock()
+        self.last_active = time.time()
+
+    def add_message(self, role, content):
+        self.messages.append({"role": role, "content": content})
+        self.last_active = time.time()
+
+    def clear(self):
+        """Forget the conversation history."""
+        self.messages = []
+        self.context_window.reset()
+
+
+class SessionStore:
+    """Thread-safe registry of sessions with idle expiry and a size bound."""
+
+    def __init__(self, max_sessions=10000, idle_timeout=3600):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        session = SessionState(**kwargs)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            # Drop the least recently used sessions beyond the limit
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        """Return a live session (marking it recently used), or None."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_active = time.time()
+            return session
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self):
+        # Caller holds the lock
+        cutoff = time.time() - self.idle_timeout
+        for session_id in [key for key, s in self._sessions.items() if s.last_active < cutoff]:
+            del self._sessions[session_id]
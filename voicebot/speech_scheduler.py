@@ -0,0 +1,174 @@
+"""
+Process-wide scheduler for background speech.
+Speech jobs from every session run on one bounded thread pool. Each
+session's jobs run one at a time in submission order, a new response can
+replace (cancel) the session's older ones, and submissions beyond a global
+limit are refused instead of piling up. Jobs never touch UI state; they
+publish status events that the UI drains on its own thread.
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SchedulerFull(Exception):
+    """Raised when too many speech jobs are already queued or running."""
+
+
+class SpeechTask:
+    """One queued speech job with a cancel token and a status channel."""
+
+    def __init__(self, scheduler, session_id, fn, args):
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self._scheduler = scheduler
+        self._cancel_callbacks = []
+        self._done_callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Ask the job to stop and run its cancel callbacks (e.g. stopping the TTS engine)."""
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error cancelling speech: {e}")
+
+    def on_cancel(self, callback):
+        """Run `callback` when the task is cancelled (immediately if it already was)."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def add_done_callback(self, callback):
+        """Run `callback(task)` once the task has finished, failed or been skipped after cancellation."""
+        with self._lock:
+            if not self.done.is_set():
+                self._done_callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self):
+        with self._lock:
+            self.done.set()
+            callbacks = list(self._done_callbacks)
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Error in speech task callback: {e}")
+
+    def report(self, **event):
+        """Publish a status event for the session (thread-safe)."""
+        self._scheduler.publish(self.session_id, event)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class SpeechScheduler:
+    """Bounded pool of speech workers with per-session FIFO ordering."""
+
+    def __init__(self, max_workers=None, max_pending=64, max_events=100, max_channels=1000):
+        max_workers = max_workers or int(os.environ.get("SPEECH_WORKERS", "4"))
+        self.max_pending = max_pending
+        self.max_events = max_events
+        self.max_channels = max_channels
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speech")
+        self._queues = {}   # session_id -> deque of tasks; the head is running
+        self._events = {}   # session_id -> deque of status events
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, fn, *args, replace=True):
+        """Queue `fn(task, *args)` for a session and return its SpeechTask.
+
+        With `replace`, the session's queued and running tasks are cancelled
+        first. Raises SchedulerFull when the global limit is reached.
+        """
+        if replace:
+            self.cancel(session_id)
+        task = SpeechTask(self, session_id, fn, args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise SchedulerFull(f"{self._pending} speech jobs are already pending")
+            self._pending += 1
+            session_queue = self._queues.setdefault(session_id, deque())
+            session_queue.append(task)
+            start = len(session_queue) == 1
+            if start:
+                self._publish(session_id, {"speaking": True})
+        if start:
+            self._executor.submit(self._run, task)
+        return task
+
+    def cancel(self, session_id):
+        """Cancel every queued or running task of a session."""
+        with self._lock:
+            tasks = list(self._queues.get(session_id, ()))
+        for task in tasks:
+            task.cancel()
+
+    def is_busy(self, session_id):
+        with self._lock:
+            return bool(self._queues.get(session_id))
+
+    def publish(self, session_id, event):
+        with self._lock:
+            self._publish(session_id, event)
+
+    def _publish(self, session_id, event):
+        # Caller holds the lock, so events are ordered with queue changes
+        events = self._events.get(session_id)
+        if events is None:
+            # Sessions that went away never drain; forget the oldest channels
+            while len(self._events) >= self.max_channels:
+                del self._events[next(iter(self._events))]
+            events = self._events[session_id] = deque(maxlen=self.max_events)
+        events.append(event)
+
+    def drain(self, session_id):
+        """Return and clear the status events published for a session, oldest first."""
+        with self._lock:
+            events = self._events.pop(session_id, None)
+        return list(events) if events else []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "active_sessions": len(self._queues)
+            }
+
+    def _run(self, task):
+        try:
+            if not task.cancelled.is_set():
+                task.fn(task, *task.args)
+        except Exception as e:
+            task.error = e
+            task.report(error=str(e))
+        finally:
+            task._finish()
+            with self._lock:
+                self._pending -= 1
+                session_queue = self._queues[task.session_id]
+                session_queue.popleft()
+                next_task = session_queue[0] if session_queue else None
+                if next_task is None:
+                    del self._queues[task.session_id]
+                    self._publish(task.session_id, {"speaking": False})
+            if next_task is not None:
+                self._executor.submit(self._run, next_task)
@@ -0,0 +1,121 @@
+"""
+Long-lived pyttsx3 speech worker.
+One thread per process owns the TTS engine (driver startup is paid once)
+and speaks queued utterances tagged by session. Cancelling an utterance
+stops the engine mid-sentence instead of waiting for the next sentence.
+"""
+import queue
+import threading
+
+
+class Utterance:
+    """A sequence of sentences to speak for one session, with a cancel token."""
+
+    def __init__(self, session_id, sentences):
+        self.session_id = session_id
+        self.sentences = sentences
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def wait(self, timeout=None):
+        """Block until the utterance has finished, been cancelled or failed."""
+        return self.done.wait(timeout)
+
+
+def iter_sentence_queue(sentence_queue, utterance, poll_interval=0.05):
+    """Yield sentences from a queue until a None sentinel or cancellation (for streamed responses).
+
+    `utterance` is anything with a `cancelled` event, such as an Utterance or a speech task.
+    """
+    while not utterance.cancelled.is_set():
+        try:
+            sentence = sentence_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+        if sentence is None:
+            return
+        yield sentence
+
+
+class SpeechWorker:
+    """Single thread that owns a pyttsx3 engine and speaks utterances in order."""
+
+    def __init__(self, engine_factory=None):
+        if engine_factory is None:
+            import pyttsx3
+            engine_factory = pyttsx3.init
+        self._engine_factory = engine_factory
+        self._engine = None
+        self._queue = queue.Queue()
+        self._utterances = []  # queued and playing, for cancellation
+        self._current = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="speech-worker", daemon=True)
+        self._thread.start()
+
+    def speak(self, session_id, sentences):
+        """Queue sentences (any iterable, consumed lazily) and return the Utterance."""
+        return self.submit(Utterance(session_id, sentences))
+
+    def submit(self, utterance):
+        """Queue a prepared Utterance."""
+        with self._lock:
+            self._utterances.append(utterance)
+        self._queue.put(utterance)
+        return utterance
+
+    def cancel(self, session_id):
+        """Cancel every queued or playing utterance of a session."""
+        with self._lock:
+            targets = [u for u in self._utterances if u.session_id == session_id]
+            current = self._current
+        for utterance in targets:
+            utterance.cancel()
+        if current is not None and current in targets:
+            self._stop_engine()
+
+    def _stop_engine(self):
+        # Interrupts runAndWait(); the started-word callback covers drivers
+        # that only honour stop() from the engine thread
+        if self._engine is not None:
+            try:
+                self._engine.stop()
+            except Exception as e:
+                print(f"Error stopping speech engine: {e}")
+
+    def _on_word(self, name, location, length):
+        current = self._current
+        if current is not None and current.cancelled.is_set():
+            self._engine.stop()
+
+    def _run(self):
+        try:
+            self._engine = self._engine_factory()
+            self._engine.connect("started-word", self._on_word)
+        except Exception as e:
+            print(f"Error starting speech engine: {e}")
+            self._engine = None
+
+        while True:
+            utterance = self._queue.get()
+            with self._lock:
+                self._current = utterance
+            try:
+                if self._engine is None:
+                    raise RuntimeError("speech engine is not available")
+                for sentence in utterance.sentences:
+                    if utterance.cancelled.is_set():
+                        break
+                    self._engine.say(sentence)
+                    self._engine.runAndWait()
+            except Exception as e:
+                utterance.error = e
+            finally:
+                with self._lock:
+                    self._current = None
+                    self._utterances.remove(utterance)
+                utterance.done.set()
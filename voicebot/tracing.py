@@ -0,0 +1,212 @@
+"""
+Lightweight per-turn latency tracing.
+A Turn collects timing spans for each pipeline stage (recording,
+transcription, language detection, intent routing, cache lookups, the LLM
+call and speech synthesis) with payload sizes and cache hits. Finished
+turns feed rolling per-stage percentiles and are appended to a JSONL file.
+When tracing is off, every call goes to shared no-op objects.
+"""
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class Span:
+    """Timing of one stage; attributes can be added while it runs."""
+
+    def __init__(self, turn, stage, attrs):
+        self.turn = turn
+        self.stage = stage
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def mark(self, name):
+        """Record the time since the span started under `name` (e.g. time to first token)."""
+        self.attrs[name] = round((time.perf_counter() - self.start) * 1000, 2)
+
+    def end(self, **attrs):
+        if self.duration is None:
+            self.attrs.update(attrs)
+            self.duration = time.perf_counter() - self.start
+            self.turn._record(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.attrs["error"] = repr(exc)
+        self.end()
+
+
+class Turn:
+    """Spans of one conversational turn, emitted once every holder has released it."""
+
+    def __init__(self, tracer, session_id, attrs):
+        self.tracer = tracer
+        self.turn_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.attrs = attrs
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._spans = []
+        self._holders = 1
+        self._lock = threading.Lock()
+
+    def span(self, stage, **attrs):
+        return Span(self, stage, attrs)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def hold(self):
+        """Keep the turn open for background work (e.g. speech) until release()."""
+        with self._lock:
+            self._holders += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            finished = self._holders == 0
+        if finished:
+            self.tracer._finish(self, time.perf_counter() - self._start)
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def to_dict(self, duration):
+        with self._lock:
+            spans = [
+                {
+                    "stage": span.stage,
+                    "offset_ms": round((span.start - self._start) * 1000, 2),
+                    "duration_ms": round(span.duration * 1000, 2),
+                    **span.attrs
+                }
+                for span in self._spans
+            ]
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "started": self.started,
+            "duration_ms": round(duration * 1000, 2),
+            **self.attrs,
+            "spans": spans
+        }
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class _NullTurn:
+    def span(self, stage, **attrs):
+        return NULL_SPAN
+
+    def set(self, **attrs):
+        pass
+
+    def hold(self):
+        return self
+
+    def release(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+NULL_TURN = _NullTurn()
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class Tracer:
+    """Process-wide sink for turns: rolling per-stage durations plus an optional JSONL file."""
+
+    def __init__(self, enabled=True, path=None, window=500):
+        self.enabled = enabled
+        self.path = path
+        self.window = window
+        self._durations = {}  # stage -> deque of recent durations (ms)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def start_turn(self, session_id, enabled=True, **attrs):
+        """Begin a turn; returns a no-op turn when tracing is off."""
+        if not (self.enabled and enabled):
+            return NULL_TURN
+        return Turn(self, session_id, attrs)
+
+    def percentiles(self):
+        """Return {stage: {"count", "p50", "p95", "p99"}} over the recent window, in milliseconds."""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._durations.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99)
+            }
+            for stage, values in sorted(samples.items())
+        }
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+
+    def _finish(self, turn, duration):
+        record = turn.to_dict(duration)
+        with self._lock:
+            self._add("turn", record["duration_ms"])
+            for span in record["spans"]:
+                self._add(span["stage"], span["duration_ms"])
+        if self.path:
+            self._write(record)
+
+    def _add(self, stage, duration_ms):
+        # Caller holds the lock
+        values = self._durations.get(stage)
+        if values is None:
+            values = self._durations[stage] = deque(maxlen=self.window)
+        values.append(duration_ms)
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            with self._write_lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as fp:
+                    fp.write(line)
+        except OSError as e:
+            print(f"Error writing trace: {e}")
@@ -0,0 +1,101 @@
+"""
+Speech recognition with concurrent multi-language auto detection.
+In auto mode the English and Bengali recognitions run in parallel and the
+result is chosen from the recognizer's confidence plus a script check on
+the returned text, so Bengali speakers no longer pay two round trips.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import speech_recognition as sr
+
+from .lang_detect import bengali_ratio
+
+# Google Speech API language codes for our supported languages
+RECOGNITION_LANGUAGES = {"en": "en-US", "bn": "bn-BD"}
+
+# Confidence above which a script-consistent first result wins without waiting for the other
+EARLY_ACCEPT_CONFIDENCE = 0.85
+
+# Google often omits the confidence; treat that as a middling score
+DEFAULT_CONFIDENCE = 0.5
+
+# Bounded pool shared by every session (two requests per auto-mode turn)
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("STT_WORKERS", "8")),
+    thread_name_prefix="stt"
+)
+
+
+def recognize(recognizer, audio_data, lang):
+    """Recognize audio in one language; returns (text, confidence) or None if nothing was understood."""
+    try:
+        result = recognizer.recognize_google(audio_data, language=RECOGNITION_LANGUAGES[lang], show_all=True)
+    except sr.UnknownValueError:
+        return None
+
+    # show_all returns [] when nothing was recognized
+    if not isinstance(result, dict) or not result.get("alternative"):
+        return None
+
+    best = result["alternative"][0]
+    return best.get("transcript", ""), float(best.get("confidence", DEFAULT_CONFIDENCE))
+
+
+def score(lang, text, confidence):
+    """Weight a result's confidence by how well its script matches the language."""
+    ratio = bengali_ratio(text)
+    script_match = ratio if lang == "bn" else 1.0 - ratio
+    return confidence * (0.5 + 0.5 * script_match)
+
+
+def recognize_auto(recognizer, audio_data, executor=None):
+    """Run English and Bengali recognition concurrently and return (text, lang) for the best result."""
+    executor = executor or _executor
+    futures = {
+        executor.submit(recognize, recognizer, audio_data, lang): lang
+        for lang in RECOGNITION_LANGUAGES
+    }
+
+    results = {}
+    errors = []
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            lang = futures[future]
+            try:
+                result = future.result()
+            except sr.RequestError as e:
+                errors.append(e)
+                continue
+            if result is None:
+                continue
+
+            text, confidence = result
+            results[lang] = (text, score(lang, text, confidence))
+
+            # A confident, script-consistent answer wins; ignore the other request
+            if pending and results[lang][1] >= EARLY_ACCEPT_CONFIDENCE:
+                for other in pending:
+                    other.cancel()
+                return text, lang
+
+    if results:
+        lang = max(results, key=lambda key: results[key][1])
+        return results[lang][0], lang
+    if errors:
+        raise errors[0]
+    raise sr.UnknownValueError()
+
+
+def transcribe(recognizer, audio_data, language="auto"):
+    """Transcribe audio in the given language ('en', 'bn' or 'auto'); returns (text, lang)."""
+    if language == "auto":
+        return recognize_auto(recognizer, audio_data)
+
+    lang = language if language in RECOGNITION_LANGUAGES else "en"
+    result = recognize(recognizer, audio_data, lang)
+    if result is None:
+        raise sr.UnknownValueError()
+    return result[0], lang
@@ -0,0 +1,101 @@
+"""
+Content-addressed disk cache for synthesized gTTS audio segments.
+Each MP3 is stored under the SHA-256 of its (language, text) pair, so
+repeated phrases are played straight from disk without calling gTTS.
+"""
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+
+def segment_key(text, lang):
+    """Content address of a segment: hash of the language and normalized text."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{lang}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class AudioSegmentCache:
+    """Directory of MP3 files with an LRU size cap based on file access times."""
+
+    def __init__(self, directory="cache/tts", max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def get(self, text, lang):
+        """Return the cached MP3 bytes for a segment, or None."""
+        path = self._path(segment_key(text, lang))
+        with self._lock:
+            try:
+                with open(path, "rb") as fp:
+                    data = fp.read()
+            except OSError:
+                self._stats["misses"] += 1
+                return None
+            # Touch the file so eviction sees it as recently used
+            os.utime(path, None)
+            self._stats["hits"] += 1
+            return data
+
+    def put(self, text, lang, data):
+        """Store MP3 bytes for a segment and evict old entries if over the cap."""
+        path = self._path(segment_key(text, lang))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as fp:
+                fp.write(data)
+            # Atomic rename so readers never see a half-written file
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._total_bytes
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((name, info.st_size, max(info.st_atime, info.st_mtime)))
+        return entries
+
+    def _evict(self):
+        # Caller holds the lock; drop least recently used files down to 90% of the cap
+        target = int(self.max_bytes * 0.9)
+        for name, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self._stats["evictions"] += 1
+
+
+def synthesize_segment(text, lang):
+    """Return MP3 bytes for a text segment from gTTS (callers check the cache first)."""
+    # Imported on first synthesis; cache hits never load gTTS
+    from gtts import gTTS
+
+    # Synthesize straight into memory instead of a temp file
+    buffer = BytesIO()
+    gTTS(text=text.strip(), lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
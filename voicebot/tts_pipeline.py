@@ -0,0 +1,131 @@
+"""
+Prefetching producer/consumer pipeline for segment-based speech synthesis.
+Segments N+1..N+k are synthesized on a bounded worker pool while segment N
+plays, and playback is handed out strictly in order.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Bounded pool shared by every session
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TTS_WORKERS", "4")),
+    thread_name_prefix="tts"
+)
+
+
+def split_segments(text, max_chars=100):
+    """Split text into segments of roughly max_chars characters on word boundaries."""
+    segments = []
+    current_segment = ""
+
+    for word in text.split():
+        current_segment += word + " "
+        if len(current_segment) > max_chars:
+            segments.append(current_segment.strip())
+            current_segment = ""
+
+    if current_segment.strip():
+        segments.append(current_segment.strip())
+    return segments
+
+
+def wait_for_playback(duration, should_stop, poll_interval=0.05):
+    """Sleep for a segment's duration, returning early (False) if asked to stop."""
+    deadline = time.monotonic() + duration
+    while True:
+        if should_stop():
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(poll_interval, remaining))
+
+
+def iter_synthesized(segments, synthesize, lookahead=3, executor=None, should_stop=None, poll_interval=0.05):
+    """Yield synthesized audio in segment order, synthesizing up to `lookahead` segments ahead.
+
+    `synthesize(segment)` returns audio and runs on the worker pool. Segments
+    are pulled on a feeder thread, so a lazy source that is still producing
+    them (a streamed reply) never holds back audio that is ready. Closing
+    the generator, or `should_stop()` turning true, cancels any synthesis
+    that has not started yet; one that is running is no longer waited for.
+    """
+    executor = executor or _executor
+    should_stop = should_stop or (lambda: False)
+    slots = threading.Semaphore(lookahead + 1)  # the current segment plus `lookahead` more in flight
+    submitted = queue.Queue()  # futures in segment order, then None (or the source's error)
+    closed = False
+    lock = threading.Lock()
+
+    def feed():
+        try:
+            for segment in segments:
+                while not slots.acquire(timeout=poll_interval):
+                    if closed:
+                        return
+                with lock:
+                    if closed:
+                        return
+                    submitted.put(executor.submit(synthesize, segment))
+            submitted.put(None)
+        except Exception as e:
+            submitted.put(e)
+
+    def next_submitted():
+        while True:
+            try:
+                return submitted.get(timeout=poll_interval)
+            except queue.Empty:
+                if should_stop():
+                    return None
+
+    threading.Thread(target=feed, name="tts-feeder", daemon=True).start()
+    try:
+        while True:
+            future = next_submitted()
+            if future is None:
+                return
+            if isinstance(future, Exception):
+                raise future
+            # A running request cannot be aborted, but its result need not be awaited
+            while not wait([future], timeout=poll_interval).done:
+                if should_stop():
+                    future.cancel()
+                    return
+            if should_stop():
+                return
+            audio = future.result()
+            slots.release()
+            yield audio
+    finally:
+        with lock:
+            closed = True
+        while True:
+            try:
+                future = submitted.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None and not isinstance(future, Exception):
+                future.cancel()
+
+
+def speak_segments(segments, synthesize, play, should_stop, lookahead=3, executor=None):
+    """Synthesize segments ahead of playback and play them in order.
+
+    `play(audio)` blocks until the segment has finished playing.
+    Returns the number of segments played.
+    """
+    played = 0
+    synthesized = iter_synthesized(segments, synthesize, lookahead, executor, should_stop)
+    try:
+        for audio in synthesized:
+            if should_stop():
+                break
+            play(audio)
+            played += 1
+    finally:
+        synthesized.close()
+    return played
@@ -0,0 +1,146 @@
+"""
+Voice activity detection and streaming microphone capture.
+Frames are classified with vectorized NumPy energy and zero-crossing-rate
+features; an UtteranceCapture state machine starts on speech onset and
+stops after a trailing silence, so recording ends when the user stops talking.
+"""
+import queue
+from collections import deque
+
+import numpy as np
+
+
+def frame_signal(samples, frame_length):
+    """Split a 1-D signal into complete, non-overlapping frames (rows)."""
+    n_frames = len(samples) // frame_length
+    return samples[:n_frames * frame_length].reshape(n_frames, frame_length)
+
+
+def frame_features(frames):
+    """Return per-frame RMS energy and zero-crossing rate."""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(frames.shape[1] - 1, 1)
+    return rms, zcr
+
+
+class VoiceActivityDetector:
+    """Energy/zero-crossing frame classifier with an adaptive noise floor."""
+
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_threshold=0.01,
+                 noise_ratio=3.0, max_zcr=0.25):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold = energy_threshold
+        self.noise_ratio = noise_ratio
+        self.max_zcr = max_zcr
+        self.noise_floor = None
+
+    def classify(self, frames):
+        """Return a boolean speech mask for a (n_frames, frame_length) array."""
+        rms, zcr = frame_features(frames)
+        if self.noise_floor is None and len(rms):
+            self.noise_floor = float(np.min(rms))
+
+        threshold = max(self.energy_threshold, (self.noise_floor or 0.0) * self.noise_ratio)
+        # Hiss and hum have a high crossing rate at low energy; loud frames
+        # count as speech regardless so fricatives are not dropped
+        speech = (rms > threshold) & ((zcr < self.max_zcr) | (rms > 2 * threshold))
+
+        # Let the noise floor follow the background level on non-speech frames
+        quiet = rms[~speech]
+        if len(quiet):
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(np.mean(quiet))
+        return speech
+
+
+class UtteranceCapture:
+    """Collect audio blocks from speech onset until trailing silence or a hard limit."""
+
+    def __init__(self, vad, silence_ms=800, max_seconds=15.0, wait_seconds=8.0, pre_roll_ms=300):
+        self.vad = vad
+        frame_ms = 1000 * vad.frame_length / vad.sample_rate
+        self.silence_frames = max(1, int(silence_ms / frame_ms))
+        self.max_frames = int(max_seconds * 1000 / frame_ms)
+        self.wait_frames = int(wait_seconds * 1000 / frame_ms)
+        self.started = False
+        self.done = False
+        self._pre_roll = deque(maxlen=max(1, int(pre_roll_ms / frame_ms)))
+        self._frames = []
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._silent_run = 0
+        self._waited = 0
+
+    def feed(self, block):
+        """Add a block of samples; returns True once the utterance is complete."""
+        if self.done:
+            return True
+
+        samples = np.concatenate([self._pending, np.asarray(block, dtype=np.float32).reshape(-1)])
+        frames = frame_signal(samples, self.vad.frame_length)
+        self._pending = samples[len(frames) * self.vad.frame_length:]
+        if not len(frames):
+            return False
+
+        for frame, is_speech in zip(frames, self.vad.classify(frames)):
+            if not self.started:
+                if is_speech:
+                    # Keep a little audio from before the onset so the first syllable is not clipped
+                    self.started = True
+                    self._frames.extend(self._pre_roll)
+                    self._frames.append(frame)
+                else:
+                    self._pre_roll.append(frame)
+                    self._waited += 1
+                    if self._waited >= self.wait_frames:
+                        self.done = True
+                        break
+                continue
+
+            self._frames.append(frame)
+            self._silent_run = 0 if is_speech else self._silent_run + 1
+            if self._silent_run >= self.silence_frames or len(self._frames) >= self.max_frames:
+                self.done = True
+                break
+
+        return self.done
+
+    def audio(self):
+        """Return the captured utterance as a 1-D float32 array (empty if no speech)."""
+        if not self._frames:
+            return np.zeros(0, dtype=np.float32)
+        # Drop most of the trailing silence, keeping a short tail
+        keep = len(self._frames) - max(0, self._silent_run - self.silence_frames // 4)
+        return np.concatenate(self._frames[:keep]).astype(np.float32)
+
+
+def capture_utterance(blocks, capture):
+    """Feed an iterable of sample blocks into a capture until it completes."""
+    for block in blocks:
+        if capture.feed(block):
+            break
+    return capture.audio()
+
+
+def record_utterance(capture, sample_rate=16000, block_ms=30, stream_factory=None):
+    """Record from the microphone through an InputStream callback until the capture completes."""
+    if stream_factory is None:
+        import sounddevice as sd
+        stream_factory = sd.InputStream
+
+    blocks = queue.Queue()
+
+    def callback(indata, frames, time_info, status):
+        # Runs on the audio thread: copy and hand off, never block here
+        blocks.put(indata[:, 0].copy())
+
+    def incoming():
+        while True:
+            try:
+                yield blocks.get(timeout=1.0)
+            except queue.Empty:
+                return
+
+    with stream_factory(samplerate=sample_rate, channels=1, dtype="float32",
+                        blocksize=int(sample_rate * block_ms / 1000), callback=callback):
+        return capture_utterance(incoming(), capture)